@@ -0,0 +1,85 @@
+import logging
+
+# Attribute universe shared by the whole process: every attribute name is interned once and
+# mapped to a bit position, so that attribute sets are stored and combined as plain integers
+__ids = dict()
+__names = list()
+
+
+# Returns the bit position associated with an attribute name, interning it if needed
+def intern(name):
+    try:
+        return __ids[name]
+    except KeyError:
+        __ids[name] = len(__names)
+        __names.append(name)
+        logging.debug('Interned attribute %s with id %d', name, __ids[name])
+        return __ids[name]
+
+
+# Separator of attribute names in input files. A value containing it is a list of names (a single name is written
+# with a trailing separator, e.g. 'price;'), otherwise every character of the value is an attribute name.
+SEPARATOR = ';'
+
+
+# Splits a value of an input file in the attribute names it lists
+def parse(text: str):
+    if SEPARATOR in text:
+        return [name.strip() for name in text.split(SEPARATOR) if name.strip()]
+    return list(text)
+
+
+# Formats attribute names as a value of an input file, the inverse of parse
+def format_names(attrs):
+    attrs = list(attrs)
+    if all(len(name) == 1 and name != SEPARATOR for name in attrs):
+        return ''.join(attrs)
+    return SEPARATOR.join(attrs) + (SEPARATOR if len(attrs) == 1 else '')
+
+
+# Joins attribute names to be printed: single char names are concatenated, longer ones separated by commas
+def label(attrs):
+    attrs = list(attrs)
+    if all(len(name) == 1 for name in attrs):
+        return ''.join(attrs)
+    return ', '.join(attrs)
+
+
+# Encodes a collection of attribute names (a string is parsed as a value of an input file) in a bitmask
+def encode(attrs):
+    if isinstance(attrs, int):
+        return attrs
+    if isinstance(attrs, str):
+        attrs = parse(attrs)
+    mask = 0
+    for attr in attrs:
+        mask |= 1 << intern(attr)
+    return mask
+
+
+# Iterates over the single-bit masks composing a bitmask, in interning order
+def bits(mask):
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+# Returns the names of the attributes in a bitmask, in interning order
+def names(mask):
+    return [__names[bit.bit_length() - 1] for bit in bits(mask)]
+
+
+# Decodes a bitmask in the set of attribute names it represents
+def decode(mask):
+    return set(names(mask))
+
+
+# Number of attributes interned so far
+def universe_size():
+    return len(__names)
+
+
+# Number of attributes contained in a bitmask
+def count(mask):
+    return bin(mask).count('1')
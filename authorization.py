@@ -0,0 +1,132 @@
+import numpy as np
+
+import attribute
+from node import Node
+
+
+# Requirements of a node on the authorization of its assignee, over the profiles of the node and its children:
+# attributes visible in plaintext, attributes visible encrypted and sets of attributes with uniform visibility
+def requirements(node: Node):
+    plain = node.vp | node.ip
+    visible = node.ve | node.vE | node.ie
+    eq = set(node.eq)
+    for child in node.children:
+        plain |= child.vp | child.ip
+        visible |= child.ve | child.vE | child.ie
+        eq |= child.eq
+    return plain, visible, frozenset(eq)
+
+
+def is_authorized(plain: int, enc: int, required):
+    required_plain, visible, eq = required
+    # Authorized for plaintext
+    if required_plain & ~plain:
+        return False
+    # Authorized for encrypted
+    if visible & ~(enc | plain):
+        return False
+    # Uniform visibility
+    for attributes in eq:
+        if attributes & ~plain and attributes & ~enc:
+            return False
+    return True
+
+
+# Inverted index of authorizations: for every attribute, the classes of authorization (a bitmask of class ids)
+# allowed to see it in plaintext and encrypted. The classes authorized for a requirement are intersections of the
+# classes of its attributes, instead of a check of every class. A new class is indexed by its own attributes only.
+class AuthorizationIndex:
+    def __init__(self):
+        # Attribute (single bit mask) -> classes
+        self.plain = dict()
+        self.enc = dict()
+        # All the classes indexed so far
+        self.classes = 0
+
+    # Indexes new classes, numbered from first in the order of authorizations (a list of (plain, enc)). Masks of
+    # attributes are built from the columns of the matrix of classes by attributes, adding classes one by one would
+    # copy the mask of an attribute for every class.
+    def add(self, first: int, authorizations: list):
+        size = max(max(plain.bit_length(), enc.bit_length()) for plain, enc in authorizations) // 8 + 1
+        for column, index in (0, self.plain), (1, self.enc):
+            rows = b''.join(authorization[column].to_bytes(size, 'little') for authorization in authorizations)
+            matrix = np.unpackbits(
+                np.frombuffer(rows, dtype=np.uint8).reshape(len(authorizations), size), axis=1, bitorder='little')
+            for position in np.flatnonzero(matrix.any(axis=0)):
+                classes = np.packbits(matrix[:, position], bitorder='little').tobytes()
+                bit = 1 << int(position)
+                index[bit] = index.get(bit, 0) | int.from_bytes(classes, 'little') << first
+        self.classes |= ((1 << len(authorizations)) - 1) << first
+
+    # Classes authorized for requirements, with the semantics of is_authorized
+    def authorized(self, required):
+        required_plain, visible, eq = required
+        classes = self.classes
+        # Authorized for plaintext
+        for bit in attribute.bits(required_plain):
+            classes &= self.plain.get(bit, 0)
+        # Authorized for encrypted (or plaintext)
+        for bit in attribute.bits(visible & ~required_plain):
+            classes &= self.plain.get(bit, 0) | self.enc.get(bit, 0)
+        # Uniform visibility: all the attributes of a set in plaintext or all encrypted
+        for attributes in eq:
+            plain = enc = classes
+            for bit in attribute.bits(attributes):
+                plain &= self.plain.get(bit, 0)
+                enc &= self.enc.get(bit, 0)
+            classes = plain | enc
+        return classes
+
+
+# Flags of classes (one for each of the first n_classes classes) in a bitmask of classes
+def class_flags(authorized_classes: int, n_classes: int):
+    data = authorized_classes.to_bytes(n_classes // 8 + 1, 'little')
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')[:n_classes].astype(bool)
+
+
+# Candidates (positions of subjects, in their order) whose class is in a bitmask of classes, given the class of
+# every subject. Classes of all the candidates are tested at once, instead of one subject at a time.
+def members(authorized_classes: int, candidates, subject_classes, n_classes: int):
+    return candidates[class_flags(authorized_classes, n_classes)[subject_classes[candidates]]]
+
+
+# Classes of authorization authorized for requirements of nodes, computed by an AuthorizationIndex and kept for
+# later selections. Subjects with the same authorization belong to the same class, classes are identified by
+# authorizations themselves, so results stay valid when authorizations of subjects change: a changed subject
+# moves to another class and only requirements computed before a new class was indexed are computed again.
+class AuthorizationCache:
+    def __init__(self):
+        # Distinct authorizations (plain, enc) -> class and class -> authorization
+        self.classes = dict()
+        self.authorizations = list()
+        self.index = AuthorizationIndex()
+        # Requirements -> (authorized classes, number of classes indexed when computed)
+        self.results = dict()
+        # Number of requirements actually computed by the index
+        self.checks = 0
+
+    # Class of authorization of every subject
+    def classify(self, authorizations: dict):
+        classes = dict()
+        first = len(self.authorizations)
+        for subject, authorization in authorizations.items():
+            key = authorization['plain'], authorization['enc']
+            if key not in self.classes:
+                self.classes[key] = len(self.authorizations)
+                self.authorizations.append(key)
+            classes[subject] = self.classes[key]
+        if first < len(self.authorizations):
+            self.index.add(first, self.authorizations[first:])
+        return classes
+
+    # Bitmask of the classes authorized for requirements
+    def authorized_classes(self, required):
+        result = self.results.get(required)
+        if result is None or result[1] < len(self.authorizations):
+            result = self.index.authorized(required), len(self.authorizations)
+            self.results[required] = result
+            self.checks += 1
+        return result[0]
+
+    def is_authorized(self, authorization_class: int, required):
+        return bool(self.authorized_classes(required) >> authorization_class & 1)
@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import time
+import traceback
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import coloredlogs as coloredlogs
+
+import export
+import main
+from cache import PlanCache
+from errors import InputError
+
+
+# Plans many input directories in parallel, writing the results of every plan as soon as it is computed
+def batch(args):
+    coloredlogs.install(
+        level=args.loglevel, fmt='%(asctime)s [%(funcName)s] %(levelname)s %(message)s', datefmt='%H:%M:%S')
+    inputs = list(args.inputs)
+    if args.manifest is not None:
+        inputs.extend(read_manifest(args.manifest))
+    jobs = output_paths(inputs, args.path)
+    logging.info('Planning %d inputs with %d workers...', len(jobs), args.workers or os.cpu_count())
+    start = time.perf_counter()
+    results = list()
+    # Pictures are rendered in background by this process, while workers compute the following plans
+    renderer = export.Renderer()
+    rendered = dict()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(plan_input, input_path, output_path, args.cache, args.formats): input_path
+            for input_path, output_path in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Worker process died, the plan failed without a result
+                result = {'input': futures[future], 'status': 'failed', 'seconds': None, 'error': repr(e)}
+            for dot_filename, filename, remove in result.pop('renders', ()):
+                renderer.render(dot_filename, filename, remove)
+                rendered[filename] = result
+            report(result)
+            results.append(result)
+    for filename, error in renderer.wait().items():
+        print('failed render  %s: %s' % (filename, error), flush=True)
+        rendered[filename]['status'] = 'failed'
+        rendered[filename].setdefault('render_errors', list()).append(repr(error))
+    renderer.shutdown()
+    failed = sum(1 for result in results if result['status'] != 'ok')
+    logging.info(
+        'Planned %d inputs in %.3fs, %d failed', len(results), time.perf_counter() - start, failed)
+    if args.report is not None:
+        with open(args.report, 'w') as file:
+            json.dump(results, file, indent=2)
+    return 1 if failed else 0
+
+
+# Reads input directories from a manifest, one per line (empty lines and lines starting with # are ignored)
+def read_manifest(filename):
+    inputs = list()
+    base = os.path.dirname(filename)
+    with open(filename) as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                inputs.append(os.path.join(base, line))
+    return inputs
+
+
+# Associates each input directory to the directory (under path) where its results are written
+def output_paths(inputs, path):
+    jobs = list()
+    names = dict()
+    for input_path in inputs:
+        name = os.path.basename(os.path.normpath(input_path))
+        names[name] = names.get(name, 0) + 1
+        if names[name] > 1:
+            name += '_' + str(names[name])
+        output_path = os.path.join(path, name, '')
+        jobs.append((os.path.join(input_path, ''), output_path))
+    return jobs
+
+
+# Computes the plan of an input directory in a worker process, any error is returned in the result.
+# Pictures are not rendered by the worker, they are listed in the result to be rendered by the caller.
+def plan_input(input_path, output_path, cache_path=None, formats=('json',)):
+    start = time.perf_counter()
+    result = {'input': input_path, 'output': output_path}
+    # Result directories are not created for missing inputs, nor left empty by failed plans
+    created = not os.path.isdir(output_path)
+    try:
+        if not os.path.isdir(input_path):
+            raise InputError('Input directory %s does not exist' % input_path)
+        os.makedirs(output_path, exist_ok=True)
+        plan_cache = PlanCache(cache_path) if cache_path is not None else None
+        renderer = export.DeferredRenderer()
+        plan_result = main.run(input_path, output_path, plan_cache=plan_cache, formats=formats, renderer=renderer)
+        result['renders'] = renderer.renders
+        if plan_result.ok:
+            result['status'] = 'ok'
+            result['cost'] = plan_result.cost
+            result['cached'] = plan_result.cached
+        else:
+            result['status'] = 'failed'
+            result['error'] = '; '.join(str(error) for error in plan_result.errors)
+            result['error_type'] = type(plan_result.errors[0]).__name__
+    except InputError as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+        result['error_type'] = type(e).__name__
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = repr(e)
+        result['traceback'] = traceback.format_exc()
+    if result['status'] != 'ok' and created and os.path.isdir(output_path) and not os.listdir(output_path):
+        os.rmdir(output_path)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def report(result):
+    if result['status'] == 'ok':
+        logging.info('%s planned in %.3fs', result['input'], result['seconds'])
+        print('ok     %8.3fs  %s' % (result['seconds'], result['input']), flush=True)
+    else:
+        logging.error('%s failed: %s', result['input'], result['error'])
+        seconds = '%8.3fs' % result['seconds'] if result['seconds'] is not None else '       -'
+        print('failed %s  %s: %s' % (seconds, result['input'], result['error']), flush=True)
+
+
+def parse_args():
+    parser = ArgumentParser(description='Plan many inputs in parallel')
+    parser.add_argument('inputs', nargs='*', metavar='INPUT', help="Directories from where read inputs")
+    parser.add_argument(
+        "-f", "--manifest", metavar='MANIFEST', dest="manifest", help="File listing input directories, one per line")
+    parser.add_argument(
+        "-p", "--path", dest="path", help="Path where to save results, one directory for each input",
+        metavar="PATH", required=True)
+    parser.add_argument(
+        "--format", nargs='+', choices=main.FORMATS, default=['json'], metavar='FORMAT', dest="formats",
+        help="Formats of exported plans: " + ', '.join(main.FORMATS) + " (default: json)")
+    parser.add_argument(
+        "-w", "--workers", type=int, metavar='N', dest="workers", help="Number of worker processes")
+    parser.add_argument(
+        "-c", "--cache", metavar='CACHE', dest="cache", help="Directory of the persistent cache of computed plans")
+    parser.add_argument(
+        "-r", "--report", metavar='REPORT', dest="report", help="JSON file where to save timing and errors")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '-v', '--verbose', help="Be verbose", action="store_const",
+        dest="loglevel", const=logging.INFO, default=logging.WARNING)
+    group.add_argument(
+        '-d', '--debug', help="Print lots of debugging statements",
+        action="store_const", dest="loglevel", const=logging.DEBUG)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    exit(batch(parse_args()))
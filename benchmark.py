@@ -0,0 +1,131 @@
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import statistics
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+import coloredlogs as coloredlogs
+
+import metrics
+import planner
+from input import read_input
+from tree import pre_order
+from workload import Workload
+
+# Phases of the algorithm, in the order they are executed by the planner
+PHASES = [
+    'read_input', 'compute_profiles', 'select_candidates', 'comp_size', 'compute_cost', 'compute_assignment',
+    'insert_encryption', 'refresh_profiles', 'extend_plan']
+
+
+# Plans input_path and returns the metrics of the phases and the number of nodes of the plan
+def run(input_path):
+    recorder = metrics.Metrics()
+    with metrics.recording(recorder):
+        with metrics.measure('read_input'):
+            inputs = planner.Inputs(*read_input(input_path))
+        result = planner.Planner(
+            inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, inputs.global_Ap).plan()
+    return recorder.report(), len(pre_order(result))
+
+
+# Benchmarks a workload with the given number of relations (attributes grow with relations)
+def benchmark(path, relations, args):
+    workload = Workload(
+        args.depth, args.fan_in, relations * args.attributes, relations, args.subjects, args.seed)
+    nodes = workload.write(path)
+    logging.info('Benchmarking %d relations (%d nodes)...', relations, nodes)
+    runs = [run(os.path.join(path, '')) for _ in range(args.repeat)]
+    # Time of a phase excludes the phases it calls (refresh_profiles is called by insert_encryption)
+    times = {phase: [report['phases'][phase]['own_seconds'] for report, _ in runs] for phase in PHASES}
+    totals = [report['seconds'] for report, _ in runs]
+    return {
+        'relations': relations, 'attributes': relations * args.attributes, 'depth': args.depth,
+        'fan_in': args.fan_in, 'subjects': args.subjects, 'seed': args.seed, 'nodes': nodes,
+        'plan_nodes': runs[0][1], 'repeat': args.repeat,
+        'phases': {phase: {'min': min(times[phase]), 'median': statistics.median(times[phase])} for phase in PHASES},
+        'total': {'min': min(totals), 'median': statistics.median(totals)},
+        # Counters do not change between runs
+        'counters': {phase: {
+            counter: value for counter, value in runs[0][0]['phases'][phase].items() if counter in metrics.COUNTERS}
+            for phase in PHASES}}
+
+
+# Prints median times of a point, compared with the ones of the same point in a previous benchmark
+def report(point, baseline=None):
+    print('%d relations, %d nodes (%d in the plan)' % (point['relations'], point['nodes'], point['plan_nodes']))
+    for phase in PHASES + ['total']:
+        median = (point['phases'].get(phase) or point['total'])['median']
+        line = '    %-20s %10.4fs' % (phase, median)
+        if baseline is not None:
+            previous = (baseline['phases'].get(phase) or baseline['total'])['median']
+            if previous > 0:
+                line += '  %6.2fx' % (median / previous)
+        print(line)
+
+
+# Results of a previous benchmark, by number of relations
+def read_baseline(filename):
+    with open(filename) as file:
+        return {point['relations']: point for point in json.load(file)['points']}
+
+
+def main(args):
+    coloredlogs.install(
+        level=args.loglevel, fmt='%(asctime)s [%(funcName)s] %(levelname)s %(message)s', datefmt='%H:%M:%S')
+    baseline = read_baseline(args.baseline) if args.baseline is not None else dict()
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+        'machine': platform.machine(), 'points': list()}
+    # Logging of the planner is not part of the measure
+    logging.disable(logging.CRITICAL)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for relations in args.scales:
+                path = os.path.join(args.keep or directory, 'workload_%d' % relations)
+                # Every scale is measured in a new process: the attribute universe of a process only grows, attributes
+                # of the workloads of previous scales would make attribute vectors of costs larger
+                with ProcessPoolExecutor(
+                        max_workers=1, mp_context=multiprocessing.get_context('spawn'), initializer=logging.disable,
+                        initargs=(logging.CRITICAL,)) as pool:
+                    point = pool.submit(benchmark, path, relations, args).result()
+                results['points'].append(point)
+                report(point, baseline.get(relations))
+    finally:
+        logging.disable(logging.NOTSET)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+def parse_args():
+    parser = ArgumentParser(description='Measure the time spent in the phases of the algorithm on random workloads')
+    parser.add_argument(
+        '-s', '--scales', type=int, nargs='+', default=[4, 16, 64, 256], metavar='N',
+        help="Number of relations of the workloads")
+    parser.add_argument(
+        '--depth', type=int, default=2, metavar='N', help="Unary operations above every relation and join")
+    parser.add_argument(
+        '--fan-in', type=int, default=2, metavar='N', dest='fan_in', help="Children of joins and cartesian products")
+    parser.add_argument('--attributes', type=int, default=3, metavar='N', help="Number of attributes per relation")
+    parser.add_argument(
+        '--subjects', type=int, default=9, metavar='N', help="Number of subjects besides user and storage providers")
+    parser.add_argument('--seed', type=int, default=0, metavar='SEED', help="Seed of the random generator")
+    parser.add_argument('-r', '--repeat', type=int, default=3, metavar='N', help="Runs of every workload")
+    parser.add_argument('-o', '--output', metavar='OUTPUT', help="JSON file where to save results")
+    parser.add_argument('-b', '--baseline', metavar='BASELINE', help="JSON file of a previous benchmark to compare")
+    parser.add_argument('-k', '--keep', metavar='PATH', help="Directory where to keep the generated workloads")
+    parser.add_argument(
+        '-v', '--verbose', help="Be verbose", action="store_const",
+        dest="loglevel", const=logging.INFO, default=logging.WARNING)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    exit(main(parse_args()))
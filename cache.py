@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+import attribute
+from catalog import Catalog
+from node import Node
+from tree import pre_order
+
+# Changing the format of cached plans (or the algorithm) requires a new version, so that old entries are not used
+CACHE_VERSION = 5
+
+
+# Canonical fingerprint of the input of the algorithm: tree, relations, subjects and authorizations.
+# Attributes are identified by name, so that the same input has the same fingerprint in every process.
+def fingerprint(
+        root: Node, catalog: Catalog, prices: dict, authorizations: dict, manual_assignment=None,
+        assignment='greedy'):
+    tree = list()
+    for node in pre_order(root):
+        tree.append([
+            node.operation, sorted(attribute.names(node.Ap)), sorted(attribute.names(node.Ae)),
+            sorted(attribute.names(node.As)), sorted(attribute.names(node.group_attr)), node.select_multi_attr,
+            node.name, len(node.children), node.relation.name if node.relation is not None else None,
+            node.selectivity])
+    relations = [[
+        rel.name, rel.storage_provider, rel.primary_key, rel.plain_attr, rel.enc_attr, rel.attr,
+        rel.enc_costs, rel.dec_costs, rel.size, rel.rows, sorted(rel.distinct.items())] for rel in catalog.relations]
+    # Order of subjects breaks ties between subjects with the same price, it is part of the input
+    subjects = [
+        [subject, str(price['comp_price']), str(price['transfer_price'])] for subject, price in prices.items()]
+    auths = sorted([
+        subject, sorted(attribute.names(auth['plain'])), sorted(attribute.names(auth['enc']))]
+        for subject, auth in authorizations.items())
+    data = [CACHE_VERSION, tree, relations, subjects, auths, manual_assignment, assignment]
+    return hashlib.sha256(json.dumps(data, default=str).encode()).hexdigest()
+
+
+# Persistent cache of final plans stored in a directory, bounded in number of entries and size.
+# Entries are written atomically (rename of a complete file) and least recently used ones are evicted,
+# so the same directory can be shared by concurrent processes.
+class PlanCache:
+    def __init__(self, path, max_entries=1024, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def __file(self, key):
+        return os.path.join(self.path, key + '.pickle')
+
+    # Returns the plan cached for key, None if missing
+    def get(self, key):
+        filename = self.__file(key)
+        try:
+            with open(filename, 'rb') as file:
+                plan = pickle.load(file)
+        except FileNotFoundError:
+            logging.debug('Plan cache miss for %s', key)
+            return None
+        except Exception as e:
+            # Any error loading an entry (truncated file, classes changed or removed...) discards it
+            logging.warning('Discarding corrupted plan cache entry %s: %r', key, e)
+            self.__remove(filename)
+            return None
+        # Mark entry as recently used
+        try:
+            os.utime(filename)
+        except FileNotFoundError:
+            pass
+        logging.info('Plan cache hit for %s', key)
+        return plan
+
+    def put(self, key, plan):
+        fd, temp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(plan, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self.__file(key))
+        except BaseException:
+            self.__remove(temp)
+            raise
+        logging.debug('Plan cached as %s', key)
+        self.evict()
+
+    # Removes least recently used entries until the cache fits its bounds
+    def evict(self):
+        entries = list()
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.pickle'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, filename = entries.pop(0)
+            logging.debug('Evicting plan cache entry %s', filename)
+            self.__remove(filename)
+            total -= size
+
+    @staticmethod
+    def __remove(filename):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
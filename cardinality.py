@@ -0,0 +1,57 @@
+import logging
+import math
+
+import attribute
+from catalog import Catalog
+from node import Node
+
+# Selectivity of selections on attributes without statistics (as in System R)
+DEFAULT_SELECTIVITY = 1 / 3
+
+
+# Estimates the number of rows produced by every node (given in post-order), from the numbers of rows of base
+# relations up the tree. The selectivity of a node, when given, is the fraction of the rows of its children (of
+# their product for joins and cartesian products) it produces. Otherwise it is estimated from numbers of distinct
+# values of attributes: 1/distinct for selections on a single attribute, 1/max(distinct) of the join attributes
+# for joins and the product of distinct values of grouping attributes for group-by.
+def estimate_rows(nodes: list, catalog: Catalog):
+    for node in nodes:
+        node.rows = max(__rows(node, catalog), 1.0)
+        logging.debug('Estimated %.1f rows for node %s', node.rows, node.name)
+
+
+def __rows(node: Node, catalog: Catalog):
+    if node.is_leaf:
+        rows = node.relation.rows
+        if rows is None:
+            logging.warning('Number of rows of relation %s is unknown, one row is assumed', node.relation.name)
+            rows = 1
+        return rows * (node.selectivity if node.selectivity is not None else 1)
+    rows = [child.rows for child in node.children]
+    if node.operation in ('join', 'cartesian'):
+        product = math.prod(rows)
+        if node.selectivity is not None:
+            return product * node.selectivity
+        if node.operation == 'cartesian':
+            return product
+        distinct = catalog.distinct(node.attributes)
+        # Without statistics the join is assumed to follow a foreign key of the largest input
+        return product / (max(distinct) if distinct else max(rows))
+    rows = max(rows)
+    if node.selectivity is not None:
+        return rows * node.selectivity
+    if node.operation == 'selection':
+        return rows * selection_selectivity(node, catalog)
+    if node.operation == 'group-by' and node.group_attr:
+        distinct = catalog.distinct(node.group_attr)
+        if len(distinct) == attribute.count(node.group_attr):
+            return min(rows, math.prod(distinct))
+    return rows
+
+
+# Fraction of rows kept by a selection without a given selectivity
+def selection_selectivity(node: Node, catalog: Catalog):
+    distinct = catalog.distinct(node.attributes)
+    if attribute.count(node.attributes) == 1 and distinct:
+        return 1 / distinct[0]
+    return DEFAULT_SELECTIVITY
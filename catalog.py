@@ -0,0 +1,59 @@
+import logging
+
+import attribute
+
+
+# Entry of the catalog, describing where and how an attribute is stored
+class Entry:
+    def __init__(self, relation, index):
+        self.relation = relation
+        self.index = index
+        self.enc_cost = relation.enc_costs[index]
+        self.dec_cost = relation.dec_costs[index]
+        self.size = relation.size[index]
+        self.encrypted = relation.attr[index] in relation.enc_attr
+        # Number of distinct values of the attribute, None if unknown
+        self.distinct = relation.distinct.get(relation.attr[index])
+
+
+# Catalog of the attributes of all base relations, built once at input time to evaluate costs
+# of an attribute without scanning relations
+class Catalog:
+    def __init__(self, relations: list):
+        logging.debug('Building attribute catalog...')
+        self.relations = relations
+        self.entries = dict()
+        # Attributes stored in plain and encrypted by storage providers
+        self.plain_mask = 0
+        self.enc_mask = 0
+        for relation in relations:
+            for index, attr in enumerate(relation.attr):
+                bit = 1 << attribute.intern(attr)
+                if bit in self.entries:
+                    raise ValueError('Catalog: attribute %s belongs to more than one relation' % attr)
+                self.entries[bit] = Entry(relation, index)
+            self.plain_mask |= relation.plain_mask
+            self.enc_mask |= relation.enc_mask
+        # Sizes of nodes are estimated from numbers of rows only if they are known (see cardinality)
+        self.statistics = any(relation.rows is not None for relation in relations)
+
+    def entry(self, bit):
+        return self.entries[bit]
+
+    # Sum of encryption costs of the attributes in mask
+    def enc_cost(self, mask):
+        return sum(self.entries[bit].enc_cost for bit in attribute.bits(mask) if bit in self.entries)
+
+    # Sum of decryption costs of the attributes in mask
+    def dec_cost(self, mask):
+        return sum(self.entries[bit].dec_cost for bit in attribute.bits(mask) if bit in self.entries)
+
+    # Sum of sizes of the attributes in mask
+    def size(self, mask):
+        return sum(self.entries[bit].size for bit in attribute.bits(mask) if bit in self.entries)
+
+    # Numbers of distinct values of the attributes in mask, for attributes whose statistics are known
+    def distinct(self, mask):
+        return [
+            self.entries[bit].distinct for bit in attribute.bits(mask)
+            if bit in self.entries and self.entries[bit].distinct is not None]
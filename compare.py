@@ -0,0 +1,45 @@
+import glob
+import logging
+import os
+from argparse import ArgumentParser
+
+import coloredlogs as coloredlogs
+
+import planner
+from errors import PlanningError
+
+
+# Total cost of the greedy and of the optimal assignment of an input directory
+def compare(input_path):
+    greedy = planner.plan(input_path)
+    optimal = planner.plan(input_path, assignment='optimal')
+    for result in greedy, optimal:
+        if not result.ok:
+            raise result.errors[0]
+    return greedy.cost, optimal.cost
+
+
+def parse_args():
+    parser = ArgumentParser(description='Compare costs of greedy and optimal assignments')
+    parser.add_argument(
+        'inputs', nargs='*', metavar='INPUT', help="Directories from where read inputs (default: Examples/*)")
+    parser.add_argument(
+        '-v', '--verbose', help="Be verbose", action="store_const",
+        dest="loglevel", const=logging.INFO, default=logging.WARNING)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    coloredlogs.install(
+        level=args.loglevel, fmt='%(asctime)s [%(funcName)s] %(levelname)s %(message)s', datefmt='%H:%M:%S')
+    inputs = args.inputs or sorted(glob.glob(os.path.join('Examples', '*')))
+    print('%-30s %10s %10s %8s' % ('input', 'greedy', 'optimal', 'saving'))
+    for input_path in inputs:
+        try:
+            greedy_cost, optimal_cost = compare(os.path.join(input_path, ''))
+        except PlanningError as e:
+            print('%-30s %s' % (os.path.normpath(input_path), e))
+            continue
+        saving = (greedy_cost - optimal_cost) / greedy_cost if greedy_cost else 0
+        print('%-30s %10g %10g %7.1f%%' % (os.path.normpath(input_path), greedy_cost, optimal_cost, 100 * saving))
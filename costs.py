@@ -0,0 +1,203 @@
+import logging
+
+import numpy as np
+
+import attribute
+from catalog import Catalog
+from errors import InputError
+
+
+# Batched cost engine: evaluates the cost of assigning a node to every subject at once, using per-subject price
+# vectors, authorization matrices over the attribute universe and per-attribute cost vectors
+class CostModel:
+    def __init__(
+            self, subjects: dict, authorizations: dict, catalog: Catalog,
+            avg_comp_price: float, avg_transfer_price: float, block_size=256, scan_size=16):
+        logging.debug('Building cost model over %d subjects...', len(subjects))
+        self.subjects = list(subjects.keys())
+        self.index = {subject: i for i, subject in enumerate(self.subjects)}
+        self.avg_comp_price = avg_comp_price
+        self.avg_transfer_price = avg_transfer_price
+        self.block_size = block_size
+        # Candidates whose cost is computed at once by the branch-and-bound scan of cheapest
+        self.scan_size = scan_size
+        # Candidates whose cost has been computed by cheapest and candidates discarded by their lower bound
+        self.evaluated = 0
+        self.pruned = 0
+        self.width = attribute.universe_size()
+        prices = [subjects[s]['comp_price'] for s in self.subjects] + \
+                 [subjects[s]['transfer_price'] for s in self.subjects] + [avg_comp_price, avg_transfer_price]
+        # Integer prices give integer costs, computed exactly as with the scalar formulas
+        self.integral = all(float(price).is_integer() for price in prices)
+        self.comp_price = np.array([subjects[s]['comp_price'] for s in self.subjects], dtype=np.float64)
+        self.transfer_price = np.array([subjects[s]['transfer_price'] for s in self.subjects], dtype=np.float64)
+        # Transfer prices of subjects delegating re-encryption are truncated to integers (as in the scalar formulas)
+        self.delegation_transfer_price = np.trunc(self.transfer_price)
+        # Authorization matrices (subject x attribute)
+        self.plain = self.__vectors([authorizations[s]['plain'] for s in self.subjects])
+        self.not_plain = 1.0 - self.plain
+        self.enc = self.__vectors([authorizations[s]['enc'] for s in self.subjects])
+        # Per-attribute cost vectors, restricted to the storage form each term applies to
+        self.dec_enc = np.zeros(self.width)
+        self.re_enc = np.zeros(self.width)
+        self.size_enc = np.zeros(self.width)
+        self.enc_plain = np.zeros(self.width)
+        # Storage providers that are not subjects have no price: costs using them are undefined
+        self.unpriced = np.zeros(self.width)
+        self.unpriced_providers = set()
+        for bit, entry in catalog.entries.items():
+            position = bit.bit_length() - 1
+            if bit & catalog.enc_mask:
+                self.dec_enc[position] = entry.dec_cost
+                self.re_enc[position] = entry.dec_cost + entry.enc_cost
+                self.size_enc[position] = entry.size
+            elif bit & catalog.plain_mask and entry.relation.storage_provider not in subjects:
+                self.unpriced[position] = 1
+                self.unpriced_providers.add(entry.relation.storage_provider)
+            elif bit & catalog.plain_mask:
+                # Encryption delegated to the storage provider, decryption performed by the user
+                self.enc_plain[position] = \
+                    entry.enc_cost * subjects[entry.relation.storage_provider]['comp_price'] \
+                    + entry.dec_cost * subjects['U']['comp_price']
+        self.nodes = list()
+        self.position = dict()
+        self.block = None
+        self.block_start = None
+
+    # Converts bitmasks in a (mask x attribute) matrix of 0/1 values
+    def __vectors(self, masks):
+        length = (self.width + 7) // 8
+        data = b''.join(mask.to_bytes(length, 'little') for mask in masks)
+        matrix = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+        return matrix.reshape(len(masks), length * 8)[:, :self.width].astype(np.float64)
+
+    def __exact(self, costs):
+        if self.integral:
+            return np.rint(costs).astype(np.int64)
+        return costs
+
+    # Sets the nodes (in the order they will be visited) whose costs are evaluated in blocks
+    def schedule(self, nodes: list):
+        self.nodes = nodes
+        self.position = {node: i for i, node in enumerate(nodes)}
+        self.block = None
+        self.block_start = None
+
+    # Computes the (node x subject) matrix of costs not depending on the assignment of other nodes, for subjects
+    # (indexes, all of them by default). The cost of a node covers the computation of its whole subtree, as evaluated
+    # by the greedy visit, or with own only the work of the node itself: comp_price * size and decryption and
+    # re-encryption of its own attributes.
+    def static_costs(self, nodes: list, own=False, subjects=None):
+        if subjects is None:
+            subjects = slice(None)
+        if own:
+            sizes = [node.size for node in nodes]
+            tot = self.__vectors([node.Ap | node.Ae for node in nodes])
+            re_enc = self.__vectors([node.Ae for node in nodes])
+        else:
+            sizes = [node.subtree_size for node in nodes]
+            tot = self.__vectors([node.totAp | node.totAe for node in nodes])
+            re_enc = self.__vectors([node.totAe for node in nodes])
+        enc = list()
+        for node in nodes:
+            mask = node.ve | node.ie
+            for child in node.children:
+                mask |= child.ve | node.ie
+            enc.append(mask)
+        enc = self.__vectors(enc)
+        comp_price = self.comp_price[subjects]
+        plain = self.plain[subjects]
+        not_plain = self.not_plain[subjects]
+        authorized_enc = self.enc[subjects]
+        # Computational cost: comp_price * subtree_size (or size of the node)
+        comp_cost = np.outer(sizes, comp_price)
+        # S decrypts the attribute
+        costs = comp_cost + ((tot * self.dec_enc) @ plain.T) * comp_price
+        # Need to delegate re-encryption of attribute
+        costs += self.avg_comp_price * ((re_enc * self.re_enc) @ not_plain.T)
+        costs += ((re_enc * self.size_enc) @ not_plain.T) \
+            * (self.avg_transfer_price + self.delegation_transfer_price[subjects])
+        # Need to delegate encryption of attribute
+        costs += (enc * self.enc_plain) @ authorized_enc.T
+        if self.unpriced_providers:
+            costs[((enc * self.unpriced) @ authorized_enc.T) > 0] = np.nan
+        return costs
+
+    # Costs of a scheduled node for its candidates not depending on attributes to re-encrypt, which are lower bounds
+    # of their costs, as (subject indexes of candidates, costs)
+    def bounds(self, node):
+        position = self.position[node]
+        if self.block is None or not self.block_start <= position < self.block_start + len(self.block):
+            self.block_start = position - position % self.block_size
+            self.block = self.static_costs(self.nodes[self.block_start:self.block_start + self.block_size])
+        candidates = np.array([self.index[cand] for cand in node.candidates])
+        costs = self.block[position - self.block_start][candidates]
+        # Calculate transfer cost of relation, no transfer if the candidate is the assignee of the parent
+        transfer = node.size * self.transfer_price[candidates]
+        transfer[candidates == self.index.get(node.parent.assignee, -1)] = 0
+        costs = costs + transfer
+        if self.unpriced_providers and np.isnan(costs).any():
+            raise InputError('Storage provider %s is not a subject' % sorted(self.unpriced_providers)[0])
+        return candidates, costs
+
+    # Cost of candidates (subject indexes) for re-encrypting attributes pushed down to the node
+    def __re_encryption(self, candidates, to_enc_dec: int):
+        re_enc = self.__vectors([to_enc_dec])[0] * self.re_enc
+        return (self.plain[candidates] @ re_enc) * self.comp_price[candidates]
+
+    # Costs of a scheduled node for its candidates, given the assignee of its parent and attributes to re-encrypt
+    def row(self, node, to_enc_dec: int):
+        candidates, costs = self.bounds(node)
+        # S can re-encrypt attribute
+        if to_enc_dec:
+            costs = costs + self.__re_encryption(candidates, to_enc_dec)
+        return self.__exact(costs)
+
+    # Candidate with minimum cost (and its cost), the first one in candidates order in case of ties.
+    # Candidates are scanned by increasing lower bound, costs of re-encryption are computed only until no remaining
+    # candidate can have a lower cost than the best one found.
+    def cheapest(self, node, to_enc_dec: int):
+        candidates, bounds = self.bounds(node)
+        if not to_enc_dec:
+            # Lower bounds are the costs
+            costs = self.__exact(bounds)
+            index = int(np.argmin(costs))
+            self.evaluated += len(costs)
+            return node.candidates[index], costs[index].item()
+        exact_bounds = self.__exact(bounds)
+        order = np.argsort(exact_bounds, kind='stable')
+        best_index, best_cost = None, None
+        scanned = 0
+        while scanned < len(order):
+            scan = order[scanned:scanned + self.scan_size]
+            if best_cost is not None and exact_bounds[scan[0]] > best_cost:
+                break
+            scanned += len(scan)
+            costs = self.__exact(bounds[scan] + self.__re_encryption(candidates[scan], to_enc_dec))
+            cost = costs.min()
+            # Ties are broken by candidates order
+            index = int(scan[costs == cost].min())
+            if best_cost is None or cost < best_cost or (cost == best_cost and index < best_index):
+                best_index, best_cost = index, cost
+        self.evaluated += scanned
+        self.pruned += len(order) - scanned
+        return node.candidates[best_index], best_cost.item()
+
+    # Cost of the work of a node (see static_costs) assigned to subject, given the assignee of its parent and
+    # attributes to re-encrypt: the cost of the node in the plan
+    def own_cost(self, node, to_enc_dec: int, subject):
+        index = np.array([self.index[subject]])
+        cost = self.static_costs([node], own=True, subjects=index)[0]
+        if subject != node.parent.assignee:
+            cost = cost + node.size * self.transfer_price[index]
+        if to_enc_dec:
+            cost = cost + self.__re_encryption(index, to_enc_dec)
+        if np.isnan(cost).any():
+            raise InputError('Storage provider %s is not a subject' % sorted(self.unpriced_providers)[0])
+        return self.__exact(cost)[0].item()
+
+    # Cost of a node for a subject, None if the subject is not a candidate of the node
+    def cost(self, node, to_enc_dec: int, subject):
+        if subject not in node.candidates:
+            return None
+        return self.row(node, to_enc_dec)[node.candidates.index(subject)].item()
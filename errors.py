@@ -0,0 +1,22 @@
+# Error stopping the computation of a plan
+class PlanningError(Exception):
+    pass
+
+
+# Input data of the algorithm is missing or not valid
+class InputError(PlanningError):
+    pass
+
+
+# A node of the plan has no authorized candidates
+class NoCandidatesError(PlanningError):
+    def __init__(self, node):
+        super().__init__('No candidates available for node ' + node.name)
+        self.node = node
+
+
+# Attributes pushed down to a base relation that no subject can re-encrypt
+class ReEncryptionError(PlanningError):
+    def __init__(self, attributes: set):
+        super().__init__('Error: %s attributes cannot be re-encrypted' % attributes)
+        self.attributes = attributes
@@ -1,131 +1,225 @@
+import json
 import logging
+import os
+import re
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-from anytree.exporter import DotExporter
-
+import attribute
 from node import Node
+from tree import post_order, pre_order
+
+# Characters escaped in DOT node names
+__ESCAPE = re.compile(r'["\\]')
 
 
-def export_tree(filename, root, dot=False):
-    if 'Plan.pdf' in filename:
-        logging.info('Exporting query plan in a PDF file placed in ' + filename)
+# Exports a plan in filename, in the format given by its extension: DOT and JSON files are written as the tree is
+# visited, other formats are pictures rendered by Graphviz (by renderer, if given, which can do it in background)
+def export_tree(filename, root, dot=False, renderer=None):
+    if 'Plan.' in os.path.basename(filename):
+        logging.info('Exporting query plan in ' + filename)
     else:
-        logging.info('Exporting final query plan in a PDF file placed in ' + filename)
+        logging.info('Exporting final query plan in ' + filename)
+    extension = os.path.splitext(filename)[1][1:]
     # Dot parameter can be used to export a dot file instead of a picture
-    if dot:
-        DotExporter(root, nodeattrfunc=node_attr, edgeattrfunc=lambda *args: 'dir=back').to_dotfile(filename)
+    if dot or extension == 'dot':
+        with open(filename, 'w', encoding='utf-8') as file:
+            for line in dot_lines(root):
+                file.write(line + '\n')
+    elif extension == 'json':
+        with open(filename, 'w', encoding='utf-8') as file:
+            for chunk in json_chunks(root):
+                file.write(chunk)
     else:
-        DotExporter(root, nodeattrfunc=node_attr, edgeattrfunc=lambda *args: 'dir=back').to_picture(filename)
+        with tempfile.NamedTemporaryFile('wb', suffix='.dot', delete=False) as file:
+            for line in dot_lines(root):
+                file.write((line + '\n').encode('utf-8'))
+        if renderer is not None:
+            renderer.render(file.name, filename, remove=True)
+        else:
+            render(file.name, filename, remove=True)
+
+
+# Renders a DOT file in a picture, whose format is given by the extension of filename
+def render(dot_filename, filename, remove=False):
+    try:
+        subprocess.check_call(['dot', dot_filename, '-T', os.path.splitext(filename)[1][1:], '-o', filename])
+    finally:
+        if remove:
+            os.remove(dot_filename)
+
+
+# Renders pictures in background threads (Graphviz runs in its own process), so that plans are computed
+# while previous ones are rendered
+class Renderer:
+    def __init__(self, workers=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.futures = dict()
+
+    def render(self, dot_filename, filename, remove=False):
+        self.futures[self.pool.submit(render, dot_filename, filename, remove)] = filename
+
+    # Waits for the pictures requested so far, returns errors by filename
+    def wait(self):
+        errors = dict()
+        for future, filename in self.futures.items():
+            try:
+                future.result()
+            except (OSError, subprocess.CalledProcessError) as e:
+                logging.error('Cannot render %s: %r', filename, e)
+                errors[filename] = e
+        self.futures = dict()
+        return errors
+
+    def shutdown(self):
+        self.wait()
+        self.pool.shutdown()
+
+
+# Records pictures to be rendered, so that they can be rendered by another process
+class DeferredRenderer:
+    def __init__(self):
+        self.renders = list()
+
+    def render(self, dot_filename, filename, remove=False):
+        self.renders.append((dot_filename, filename, remove))
+
+
+# Lines of the DOT graph of a plan: nodes are identified by their names, edges point from children to parents
+def dot_lines(root: Node):
+    nodes = pre_order(root)
+    yield 'digraph tree {'
+    for node in nodes:
+        yield '    "%s" [%s];' % (escape(node.name), node_attr(node))
+    for node in nodes:
+        for child in node.children:
+            yield '    "%s" -> "%s" [dir=back];' % (escape(node.name), escape(child.name))
+    yield '}'
+
+
+def escape(name):
+    return __ESCAPE.sub(lambda match: '\\' + match.group(0), str(name))
+
+
+# Converts a plan in a JSON serializable dictionary, attributes are listed by name
+def plan_to_dict(root: Node):
+    data = dict()
+    # Children are converted before their parents
+    for node in post_order(root):
+        data[node] = __node_dict(node)
+        data[node]['children'] = [data.pop(child) for child in node.children]
+    return data[root]
+
+
+# JSON text of plan_to_dict(root) in chunks, one for every node, written without building the whole dictionary
+def json_chunks(root: Node):
+    # Children still to be written at every level of the visit and whether one of them has been written
+    stack = [[iter((root,)), False]]
+    while stack:
+        level = stack[-1]
+        node = next(level[0], None)
+        if node is None:
+            stack.pop()
+            if stack:
+                yield ']}'
+            continue
+        text = json.dumps(__node_dict(node))
+        yield (', ' if level[1] else '') + text[:-1] + ', "children": ['
+        level[1] = True
+        stack.append([iter(node.children), False])
+
+
+def __node_dict(node: Node):
+    data = {
+        'operation': node.operation,
+        'label': node.name,
+        'assignee': node.assignee or None,
+        'candidates': list(node.candidates),
+        'cost': node.cost,
+        'profile': {
+            'vp': sorted(attribute.names(node.vp)), 've': sorted(attribute.names(node.ve)),
+            'vE': sorted(attribute.names(node.vE)), 'ip': sorted(attribute.names(node.ip)),
+            'ie': sorted(attribute.names(node.ie)),
+            'eq': sorted(sorted(attribute.names(eq)) for eq in node.eq)}}
+    if node.is_leaf and node.relation is not None:
+        data['relation'] = node.relation.name
+    return data
 
 
 def node_attr(node: Node):
     # If operation is a cryptographic operation draw an ellipse box
     if node.cryptographic:
-        label = 'label=<'
-        for attr in node.Ae:
-            label += attr
-        if not len(node.Ae):
-            for attr in node.Ap:
-                label += attr
-        label += '<BR/>Assignee:&nbsp;<B>' + node.assignee + '</B>'
-        label += '>'
+        parts = ['label=<', attribute.label(attribute.names(node.Ae))]
+        if not node.Ae:
+            parts.append(attribute.label(attribute.names(node.Ap)))
+        parts += ['<BR/>Assignee:&nbsp;<B>', node.assignee, '</B>>']
         # Re-encryption is half greyed out
         if node.operation == 're-encryption':
-            label += 'style=filled, fillcolor=\"white;0.5:#00AEEF\", gradientangle=90'
+            parts.append('style=filled, fillcolor=\"white;0.5:#00AEEF\", gradientangle=90')
         # Encryption is totally greyed out
         elif node.operation == 'encryption':
-            label += 'style=filled, fillcolor=\"#00AEEF\"'
-    elif node.operation == 'query':
-        label = 'label=<User formulating the query>, shape=box'
+            parts.append('style=filled, fillcolor=\"#00AEEF\"')
+        return ''.join(parts)
+    if node.operation == 'query':
+        return 'label=<User formulating the query>, shape=box'
     # All the other nodes goes in a normal circle, with candidates and assignee in bold
-    else:
-        label = node.name
-        label = label.replace('>', '&gt;').replace('<', '&lt;')
-        label = 'label=<<table border="1" cellborder="1"><tr><td border="0" colspan="3">' + label
-        label = label.replace('Selection ', '&sigma;<sub>')
-        label = label.replace('Group-by ', '&gamma;<sub>')
-        label = label.replace('Join ', '⋈<sub>')
-        label = label.replace('Projection ', '&pi;<sub>')
-        label = label.replace('Cartesian', '&times;')
-        if label.find('<sub>') != -1:
-            label += '</sub>'
-        label += '</td>'
-        if len(node.vp) or len(node.ve) or len(node.vE) or len(node.ip) or len(node.ie) or len(node.eq):
-            # Print profile
-            label += '<td>'
-            for attr in node.vp:
-                label += attr
-            # If there are no attributes print a space
-            if not node.vp:
-                label += ' '
-            label += '</td><td bgcolor="#00AEEF">'
-            for attr in node.ve:
-                label += attr
-            if not node.ve:
-                label += ' '
-            label += '</td><td bgcolor="#00AEEF">'
-            for attr in node.vE:
-                label += attr
-            if not node.vE:
-                label += ' '
-            label += '</td>'
-        label += '</tr><tr>'
-        label += '<td border="0" colspan="3">'
-        # Print candidates
-        if not node.is_leaf and len(node.candidates):
-            label += 'Candidates:<B> '
-            for cand in node.candidates:
-                label += cand
-            label += '</B>'
-        # Print a space in order to preserve row height
-        elif node.is_leaf:
-            label += '&uarr;'
-        label += '</td>'
-        if len(node.vp) or len(node.ve) or len(node.vE) or len(node.ip) or len(node.ie) or len(node.eq):
-            label += '<td>'
-            for attr in node.ip:
-                label += attr
-            if not node.ip:
-                label += ' '
-            label += '</td><td bgcolor="#00AEEF">'
-            for attr in node.ie:
-                label += attr
-            if not node.ie:
-                label += ' '
-            label += '</td>'
-        label += '</tr>'
-        if not node.is_leaf and node.assignee != '':
-            label += '<tr><td border="0" colspan="3">Assignee:<B> ' + node.assignee + '</B></td>'
-        elif node.is_leaf:
-            label += '<tr><td border="0" colspan="3">' + node.relation.name + '('
-            for attr in node.relation.primary_key:
-                if attr in node.relation.plain_attr:
-                    label += attr
-                else:
-                    label += '<font color="firebrick">' + attr + '</font>'
-            for attr in node.relation.plain_attr:
-                if attr not in node.relation.primary_key:
-                    label += attr
-            label += '<font color="firebrick">'
-            for attr in node.relation.enc_attr:
-                if attr not in node.relation.primary_key:
-                    label += attr
-            label += '</font>)</td></tr>'
-            if '<font color="firebrick"></font>' in label:
-                label = label.replace('<font color="firebrick"></font>', '')
-        if len(node.vp) or len(node.ve) or len(node.vE) or len(node.ip) or len(node.ie) or len(node.eq):
-            # eq sets need to be printed with ; in order to separate them
-            if label.endswith('</tr>'):
-                label = label[:-5]
-            label += '<td>'
-            for collection in node.eq:
-                for attr in collection:
-                    label += attr
-                label += ';'
-            label += '</td></tr>'
-        if node.is_leaf:
-            label += '<tr><td border="0" colspan="3">@' + node.relation.storage_provider.upper() + '</td></tr>'
-        label += '</table>>'
-        label += 'shape=plain'
-        if not node.eq:
-            label += ' '
-    return label
+    title = node.name.replace('>', '&gt;').replace('<', '&lt;')
+    title = title.replace('Selection ', '&sigma;<sub>')
+    title = title.replace('Group-by ', '&gamma;<sub>')
+    title = title.replace('Join ', '⋈<sub>')
+    title = title.replace('Projection ', '&pi;<sub>')
+    title = title.replace('Cartesian', '&times;')
+    parts = ['label=<<table border="1" cellborder="1"><tr><td border="0" colspan="3">', title]
+    if '<sub>' in title:
+        parts.append('</sub>')
+    parts.append('</td>')
+    profile = node.vp or node.ve or node.vE or node.ip or node.ie or len(node.eq)
+    if profile:
+        # Print profile, if there are no attributes print a space
+        parts += [
+            '<td>', __attributes(node.vp), '</td><td bgcolor="#00AEEF">', __attributes(node.ve),
+            '</td><td bgcolor="#00AEEF">', __attributes(node.vE), '</td>']
+    parts.append('</tr><tr><td border="0" colspan="3">')
+    # Print candidates
+    if not node.is_leaf and len(node.candidates):
+        parts += ['Candidates:<B> ', ''.join(node.candidates), '</B>']
+    # Print a space in order to preserve row height
+    elif node.is_leaf:
+        parts.append('&uarr;')
+    parts.append('</td>')
+    if profile:
+        parts += ['<td>', __attributes(node.ip), '</td><td bgcolor="#00AEEF">', __attributes(node.ie), '</td>']
+    parts.append('</tr>')
+    if not node.is_leaf and node.assignee != '':
+        parts.append('<tr><td border="0" colspan="3">Assignee:<B> ' + node.assignee + '</B></td>')
+    elif node.is_leaf:
+        parts.append(__relation(node.relation))
+    if profile:
+        # eq sets need to be printed with ; in order to separate them (in the same order for equal sets)
+        if parts[-1].endswith('</tr>'):
+            parts[-1] = parts[-1][:-5]
+        parts += ['<td>', ''.join(attribute.label(attribute.names(eq)) + ';' for eq in sorted(node.eq)), '</td></tr>']
+    if node.is_leaf:
+        parts += ['<tr><td border="0" colspan="3">@', node.relation.storage_provider.upper(), '</td></tr>']
+    parts.append('</table>>shape=plain')
+    if not node.eq:
+        parts.append(' ')
+    return ''.join(parts)
+
+
+def __attributes(mask):
+    return attribute.label(attribute.names(mask)) or ' '
+
+
+# Row with the name of a relation and its attributes (primary key first, encrypted attributes in red)
+def __relation(relation):
+    separator = '' if all(len(attr) == 1 for attr in relation.attr) else ', '
+    attrs = [
+        attr if attr in relation.plain_attr else '<font color="firebrick">' + attr + '</font>'
+        for attr in relation.primary_key]
+    attrs += [attr for attr in relation.plain_attr if attr not in relation.primary_key]
+    encrypted = [attr for attr in relation.enc_attr if attr not in relation.primary_key]
+    if encrypted:
+        attrs.append('<font color="firebrick">' + separator.join(encrypted) + '</font>')
+    return '<tr><td border="0" colspan="3">' + relation.name + '(' + separator.join(attrs) + ')</td></tr>'
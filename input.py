@@ -1,7 +1,10 @@
+import csv
 import logging
+import os
+import statistics
 
-import pandas as pd
-
+import attribute
+from catalog import Catalog
 from node import Node
 from relation import Relation
 
@@ -9,74 +12,144 @@ from relation import Relation
 def read_input(input_path):
     logging.info("Reading data from input files...")
     nodes, global_Ap = read_tree(input_path)
-    relations = read_relations(input_path, nodes)
-    subjects, avg_comp_price, avg_transfer_price = read_subjects(input_path)
+    catalog = Catalog(read_relations(input_path, nodes))
+    prices = read_prices(input_path)
     authorizations = read_authorizations(input_path)
-    return nodes[0], relations, subjects, authorizations, avg_comp_price, avg_transfer_price, global_Ap
+    return nodes[0], catalog, prices, authorizations, global_Ap
 
 
 def read_tree(input_path):
     logging.debug('Reading tree structure...')
-    global_Ap = set()
+    rows = list()
+    for row in read_csv(input_path + 'tree.csv'):
+        row['ID'] = int(row['ID'])
+        row['parent'] = int(row['parent']) if row['parent'] else 0
+        rows.append(row)
+    return build_tree(rows)
+
+
+# Streams the rows of a CSV file as dictionaries, missing values are empty strings
+def read_csv(filename):
+    with open(filename, newline='', encoding='utf-8-sig') as file:
+        for row in csv.DictReader(file, restval=''):
+            # Values exceeding the header are ignored
+            row.pop(None, None)
+            yield row
+
+
+# Builds the tree from rows with the columns of tree.csv (the first row is the root)
+def build_tree(rows: list):
+    global_Ap = 0
     nodes = list()
-    df = pd.read_csv(input_path + 'tree.csv')
-    df['parent'] = df['parent'].fillna(value=0)
-    df = df.fillna(value='')
-    df = df.astype({'ID': 'int', 'parent': 'int'})
-    df = df.astype({'Ap': 'str', 'Ae': 'str', 'As': 'str'})
-    for idx, row in df.iterrows():
-        global_Ap = global_Ap.union(set(row['Ap']))
+    for idx, row in enumerate(rows):
+        global_Ap |= attribute.encode(row['Ap'])
         multi_attr = False
         if row['operation'] == 'selection':
-            if (len(row['Ap']) + len(row['Ae']) + len(row['As'])) > 1:
+            if sum(len(attribute.parse(row[column])) for column in ('Ap', 'Ae', 'As')) > 1:
                 multi_attr = True
+        # Selectivity is optional
+        selectivity = float(row['selectivity']) if row.get('selectivity') not in (None, '') else None
         if not idx:
             node = Node(
                 operation=row['operation'], Ap=row['Ap'], Ae=row['Ae'], As=row['As'],
-                print_label=row['print_label'], group_attr=row['group_attr'], select_multi_attr=multi_attr)
+                print_label=row['print_label'], group_attr=row['group_attr'], select_multi_attr=multi_attr,
+                selectivity=selectivity)
         else:
+            # Parents precede their children, a missing parent would link the node to the last one
+            if not 1 <= row['parent'] <= idx:
+                raise ValueError('Input: node %s has no valid parent' % row['ID'])
             node = Node(
                 operation=row['operation'], Ap=row['Ap'], Ae=row['Ae'], As=row['As'],
                 print_label=row['print_label'], group_attr=row['group_attr'],
-                select_multi_attr=multi_attr, parent=nodes[row['parent'] - 1])
+                select_multi_attr=multi_attr, parent=nodes[row['parent'] - 1], selectivity=selectivity)
         nodes.append(node)
     return nodes, global_Ap
 
 
 def read_relations(input_path, nodes: list):
+    relations = list()
+    for node_id, relation in read_base_relations(input_path):
+        relations.append(relation)
+        nodes[node_id - 1].relation = relation
+    return relations
+
+
+# Base relations with the id of the leaf node they are associated with. Numbers of rows (optional rows column)
+# and of distinct values of attributes (optional histograms/<name>.csv file) are statistics of relations.
+def read_base_relations(input_path):
     logging.debug('Reading relations...')
     relations = list()
-    df = pd.read_csv(input_path + 'relations.csv')
-    df = df.fillna(value='')
-    df = df.astype('str')
-    df = df.astype({'node_id': int})
-    for idx, row in df.iterrows():
+    for row in read_csv(input_path + 'relations.csv'):
+        rows, distinct = row.get('rows'), None
+        histogram = os.path.join(input_path, 'histograms', row['name'] + '.csv')
+        if os.path.exists(histogram):
+            histogram_rows, distinct = read_histogram(histogram)
+            if not rows:
+                rows = histogram_rows
         relation = Relation(
             name=row['name'], storage_provider=row['provider'], primary_key=row['primary_key'],
             plain_attr=row['plain_attr'], enc_attr=row['enc_attr'], attr=row['attr'],
-            enc_costs=row['enc_costs'], dec_costs=row['dec_costs'], size=row['size'])
-        relations.append(relation)
-        nodes[row['node_id'] - 1].relation = relation
+            enc_costs=row['enc_costs'], dec_costs=row['dec_costs'], size=row['size'], rows=rows, distinct=distinct)
+        relations.append((int(row['node_id']), relation))
     return relations
 
 
+# Reads the histogram of a relation, with the number of rows (count) having each value of an attribute.
+# Returns the number of rows of the relation (rows counted for its first attribute) and the number of distinct
+# values of every attribute.
+def read_histogram(filename):
+    logging.debug('Reading histogram %s...', filename)
+    counts = dict()
+    for row in read_csv(filename):
+        values = counts.setdefault(row['attribute'], dict())
+        values[row['value']] = values.get(row['value'], 0) + int(row['count'])
+    if not counts:
+        return None, dict()
+    rows = sum(next(iter(counts.values())).values())
+    return rows, {attr: len(values) for attr, values in counts.items()}
+
+
 def read_subjects(input_path):
+    return sort_subjects(read_prices(input_path))
+
+
+# Prices of subjects, in the order they appear in the input
+def read_prices(input_path):
     logging.debug('Reading subjects...')
-    df = pd.read_csv(input_path + 'subjects.csv')
-    if df.isnull().values.any():
-        raise ValueError("Input: Subjects dataframe can't contain NaN values")
-    df = df.set_index('subject')
-    df['sum'] = df['comp_price'] + df['transfer_price']
-    df = df.sort_values(by=['sum'])
-    df = df.drop(columns=['sum'])
-    subjects = df.T.to_dict('dict')
-    avg_comp_price = df['comp_price'].median()
-    avg_transfer_price = df['transfer_price'].median()
+    prices = dict()
+    for row in read_csv(input_path + 'subjects.csv'):
+        if not all(row.values()):
+            raise ValueError("Input: Subjects can't have missing values")
+        subject = row.pop('subject')
+        if subject in prices:
+            raise ValueError('Input: subject %s is defined more than once' % subject)
+        prices[subject] = {column: parse_number(value) for column, value in row.items()}
+    return prices
+
+
+# Parses an integer or, if not integer, a float number
+def parse_number(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+# Sorts subjects by comp+transfer price and computes median prices
+def sort_subjects(prices: dict):
+    subjects = dict(sorted(prices.items(), key=lambda item: item[1]['comp_price'] + item[1]['transfer_price']))
+    avg_comp_price = statistics.median(price['comp_price'] for price in prices.values())
+    avg_transfer_price = statistics.median(price['transfer_price'] for price in prices.values())
     return subjects, int(avg_comp_price), int(avg_transfer_price)
 
 
 def read_authorizations(input_path):
     logging.debug('Reading authorizations...')
-    df = pd.read_csv(input_path + 'authorizations.csv')
-    df = df.fillna(value='')
-    return df.set_index('subject').T.to_dict('dict')
+    authorizations = dict()
+    # Authorized attributes are encoded once, so that checks on candidates are bitmask operations
+    for row in read_csv(input_path + 'authorizations.csv'):
+        subject = row.pop('subject')
+        row['plain'] = attribute.encode(row['plain'])
+        row['enc'] = attribute.encode(row['enc'])
+        authorizations[subject] = row
+    return authorizations
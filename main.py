@@ -1,55 +1,109 @@
+import json
 import logging
 from argparse import ArgumentParser
 
 import coloredlogs as coloredlogs
-from anytree import PostOrderIter
 
 import export
-import procedures as p
-from input import read_input
-from node import Node
+import metrics
+from cache import PlanCache
+from errors import InputError
+from planner import Inputs, PlanResult, plan
 
+# Formats of exported plans: pictures rendered by Graphviz, DOT graphs and JSON documents
+PICTURES = ['pdf', 'svg', 'png']
+FORMATS = PICTURES + ['dot', 'json']
 
-def main():
+
+def main(args):
     coloredlogs.install(
         level=args.loglevel, fmt='%(asctime)s [%(funcName)s] %(levelname)s %(message)s', datefmt='%H:%M:%S')
     logging.info('Starting program...')
+    plan_cache = None
+    if args.cache is not None:
+        plan_cache = PlanCache(args.cache, max_entries=args.cache_entries)
+    recorder = None
+    if args.metrics is not None or args.profile is not None:
+        recorder = metrics.Metrics(profile=args.profile is not None, memory=args.memory)
+    # Pictures are rendered in background while the plan is computed
+    renderer = None
+    if any(extension in PICTURES for extension in args.formats):
+        renderer = export.Renderer()
     # Manual assignment of assignee (used to simulate same execution contained in the paper)
-    manual_assignment = args.manual_assignment
+    with metrics.recording(recorder):
+        result = run(
+            args.input, args.path, args.manual_assignment, plan_cache, args.assignment, args.workers,
+            args.formats, renderer)
+    for error in result.errors:
+        print(error)
+    rendered = True
+    if renderer is not None:
+        errors = renderer.wait()
+        renderer.shutdown()
+        for filename, error in errors.items():
+            print('Cannot render %s: %s' % (filename, error))
+        rendered = not errors
+    if args.profile is not None:
+        recorder.dump_profile(args.profile)
+    if args.metrics is not None:
+        with open(args.metrics, 'w') as file:
+            json.dump(recorder.report(), file, indent=2)
+    return 0 if result.ok and rendered else 1
+
+
+# Computes the plan of the input in input_path and exports it in output_path, in every format (file extension)
+# of formats, pictures are rendered by renderer if given
+def run(
+        input_path, output_path, manual_assignment=None, plan_cache=None, assignment='greedy', workers=None,
+        formats=('pdf',), renderer=None):
     # Read input data for the algorithm
-    root, relations, subjects, authorizations, avg_comp_price, avg_transfer_price, global_Ap = read_input(args.input)
-    export.export_tree(args.path + 'Plan.pdf', root)
-    # Insert a node as parent of root assigned to the user formulating the query
-    Node('query', Ap=set('CPI'), print_label='User formulating the query', children={root})
-    root.parent.assignee = 'U'
-    # Identify candidates for each node in the tree
-    p.identify_candidates(root, subjects, authorizations, global_Ap)
-    # Compute size of every node
-    p.comp_size(root, relations)
-    # Compute cost of any node assigned to any subject
-    p.compute_cost(root, subjects)
-    # Assign nodes to subjects and insert re-encryption operations
-    p.compute_assignment(
-        root, subjects, authorizations, relations, avg_comp_price, avg_transfer_price, manual_assignment)
-    # Insert encryption to made authorized assignees
-    p.insert_encryption(authorizations, relations, root, subjects)
-    # Inject encryption/decryption operation
-    p.extend_plan(root.root, authorizations)
-    for node in PostOrderIter(root):
-        node.compute_profile()
-    # Export results in a PDF document
-    export.export_tree(args.path + 'Tree.pdf', root.root)
+    try:
+        with metrics.measure('read_input'):
+            inputs = Inputs.read(input_path)
+    except InputError as e:
+        return PlanResult(errors=[e])
+    with metrics.measure('export'):
+        for extension in formats:
+            export.export_tree(output_path + 'Plan.' + extension, inputs.root, renderer=renderer)
+    result = plan(inputs, manual_assignment, plan_cache, assignment, workers)
+    # Export results
+    if result.ok:
+        with metrics.measure('export'):
+            for extension in formats:
+                export.export_tree(output_path + 'Tree.' + extension, result.plan, renderer=renderer)
+    return result
 
 
 def parse_args():
     parser = ArgumentParser()
     parser.add_argument(
-        "-p", "--path", dest="path", help="Path where to save exported PDFs plans", metavar="PATH", required=True)
+        "-p", "--path", dest="path", help="Path where to save exported plans", metavar="PATH", required=True)
+    parser.add_argument(
+        "-f", "--format", nargs='+', choices=FORMATS, default=['pdf'], metavar='FORMAT', dest="formats",
+        help="Formats of exported plans: " + ', '.join(FORMATS) + " (default: pdf)")
     parser.add_argument(
         "-m", "--manual", type=list, metavar='ASSIGNMENT',
         dest="manual_assignment", help="Manual assignment of candidates to nodes")
+    parser.add_argument(
+        "-a", "--assignment", choices=['greedy', 'optimal'], default='greedy', dest="assignment",
+        help="Assignment of nodes: greedy visit of the tree or minimum total cost")
+    parser.add_argument(
+        "-w", "--workers", type=int, metavar='N', dest="workers",
+        help="Number of worker processes filtering candidates of nodes (default: no workers)")
     parser.add_argument(
         "-i", "--input", metavar='INPUT', dest="input", help="Path from where read input", required=True)
+    parser.add_argument(
+        "-c", "--cache", metavar='CACHE', dest="cache", help="Directory of the persistent cache of computed plans")
+    parser.add_argument(
+        "--cache-entries", type=int, default=1024, metavar='N', dest="cache_entries",
+        help="Maximum number of plans kept in the cache")
+    parser.add_argument(
+        "--metrics", metavar='METRICS', dest="metrics",
+        help="JSON file where to save time and counters of every phase of the algorithm")
+    parser.add_argument(
+        "--profile", metavar='PROFILE', dest="profile", help="File where to save cProfile data (readable by pstats)")
+    parser.add_argument(
+        "--memory", action="store_true", dest="memory", help="Trace memory allocated by every phase (slow)")
     group = parser.add_mutually_exclusive_group()
     group.add_argument(
         '-v', '--verbose', help="Be verbose", action="store_const",
@@ -61,5 +115,4 @@ def parse_args():
 
 
 if __name__ == '__main__':
-    args = parse_args()
-    main()
+    exit(main(parse_args()))
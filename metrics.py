@@ -0,0 +1,150 @@
+import cProfile
+import contextlib
+import functools
+import io
+import pstats
+import time
+import tracemalloc
+
+# Counters recorded for every phase of the algorithm
+COUNTERS = ['nodes', 'candidate_evaluations', 'pruned_candidates', 'authorization_checks', 'crypto_nodes']
+
+# Metrics being recorded, None when recording is disabled
+__current = None
+
+
+# Time, counters and memory of a phase of the algorithm. Time spent in phases started while the phase is
+# running is included in seconds and excluded from own_seconds.
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.own_seconds = 0.0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        # Peak of memory allocated while the phase is running (bytes), only when memory is traced
+        self.memory_peak = None
+
+    def to_dict(self):
+        result = {'calls': self.calls, 'seconds': self.seconds, 'own_seconds': self.own_seconds}
+        result.update(self.counters)
+        if self.memory_peak is not None:
+            result['memory_peak'] = self.memory_peak
+        return result
+
+
+# Metrics of an execution of the algorithm, with optional cProfile and tracemalloc capture.
+# Procedures add their counters once per call to the innermost running phase.
+class Metrics:
+    def __init__(self, profile=False, memory=False):
+        self.phases = dict()
+        self.profiler = cProfile.Profile() if profile else None
+        self.memory = memory
+        self.seconds = 0.0
+        self.__running = list()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(name)
+        self.__running.append(phase)
+        if self.memory:
+            memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            seconds = time.perf_counter() - start
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1] - memory_start
+                phase.memory_peak = max(phase.memory_peak or 0, peak)
+            self.__running.pop()
+            phase.calls += 1
+            phase.seconds += seconds
+            phase.own_seconds += seconds
+            if self.__running:
+                self.__running[-1].own_seconds -= seconds
+
+    def add(self, **counters):
+        if not self.__running:
+            return
+        phase_counters = self.__running[-1].counters
+        for counter, value in counters.items():
+            phase_counters[counter] += value
+
+    # Structured report of the metrics, with the functions that took most time when profiling
+    def report(self, functions=25):
+        result = {'seconds': self.seconds, 'phases': {name: phase.to_dict() for name, phase in self.phases.items()}}
+        result['totals'] = {
+            counter: sum(phase.counters[counter] for phase in self.phases.values()) for counter in COUNTERS}
+        if self.profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(functions)
+            result['profile'] = stream.getvalue()
+        return result
+
+    # Saves profiling data in a file readable by pstats
+    def dump_profile(self, filename):
+        if self.profiler is not None:
+            self.profiler.dump_stats(filename)
+
+
+# Records metrics of the code executed in the context, a None metrics disables recording
+@contextlib.contextmanager
+def recording(metrics: Metrics = None):
+    global __current
+    previous, __current = __current, metrics
+    if metrics is None:
+        try:
+            yield None
+        finally:
+            __current = previous
+        return
+    tracing = metrics.memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    if metrics.profiler is not None:
+        metrics.profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.seconds += time.perf_counter() - start
+        if metrics.profiler is not None:
+            metrics.profiler.disable()
+        if tracing:
+            tracemalloc.stop()
+        __current = previous
+
+
+# Metrics being recorded, None if recording is disabled
+def current():
+    return __current
+
+
+# Context measuring a phase, it does nothing when metrics are not recorded
+def measure(name):
+    if __current is None:
+        return contextlib.nullcontext()
+    return __current.phase(name)
+
+
+# Decorator measuring every call of a function as a phase
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if __current is None:
+                return function(*args, **kwargs)
+            with __current.phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Adds counters to the running phase, it does nothing when metrics are not recorded
+def add(**counters):
+    if __current is not None:
+        __current.add(**counters)
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+from argparse import ArgumentParser
+
+import coloredlogs as coloredlogs
+
+import export
+import main
+from authorization import AuthorizationCache
+from errors import InputError, PlanningError
+from input import read_csv
+from parallel import ParallelChecker
+from planner import Planner, PlanResult
+from server import State
+from tree import post_order
+
+# Fields of a node computed by its preparation (profiles, sizes, costs and candidates), the same for identical subtrees
+PREPARED = (
+    'vp', 've', 'vE', 'ip', 'ie', 'eq', 'totAp', 'totAe', 'rows', 'size', 'subtree_size', 'candidates', 'dirty')
+
+
+# Hash-consing of subtrees: structurally identical subtrees (same operations, attributes and relations, with
+# identical children in the same order) get the same id. Profiles of leaves also depend on the attributes
+# required in plaintext by their query (global_Ap), which are part of the id of a leaf.
+class Subtrees:
+    def __init__(self):
+        self.ids = dict()
+
+    # Id of every node of the tree rooted in root
+    def identify(self, root, global_Ap: int):
+        ids = dict()
+        for node in post_order(root):
+            key = (
+                node.operation, node.Ap, node.Ae, node.As, node.group_attr, node.select_multi_attr, node.selectivity,
+                node.relation.name if node.relation is not None else None,
+                global_Ap & node.attributes if node.is_leaf else None,
+                tuple(ids[child] for child in node.children))
+            ids[node] = self.ids.setdefault(key, len(self.ids))
+        return ids
+
+
+# Plans a batch of queries (name -> Inputs, or InputError if the query could not be read) over the same relations,
+# subjects and authorizations. Subtrees identical to one of a query planned before are not prepared again: their
+# profiles, sizes, costs and candidates are copied. Authorization checks are shared by all the queries.
+# Returns the results by name and the subplans shared by more than one consumer (see shared_subplans).
+def plan_batch(queries: dict, assignment='greedy', workers=None):
+    subtrees = Subtrees()
+    authorized = AuthorizationCache()
+    # Prepared node of every subtree id and the nodes (name of the query, node, id of the parent) with that id
+    prepared = dict()
+    occurrences = dict()
+    results = dict()
+    # Worker processes are shared by the planners of all the queries
+    parallel = ParallelChecker(workers) if workers is not None else None
+    try:
+        for name, inputs in queries.items():
+            if isinstance(inputs, InputError):
+                results[name] = PlanResult(errors=[inputs])
+                continue
+            ids = subtrees.identify(inputs.root, inputs.global_Ap)
+            copied = set()
+            for node, subtree in ids.items():
+                parent = ids[node.parent] if node.parent is not None else None
+                occurrences.setdefault(subtree, list()).append((name, node, parent))
+                if subtree in prepared:
+                    copy_prepared(prepared[subtree], node)
+                    copied.add(node)
+            logging.info('Query %s: %d of %d nodes prepared by other queries', name, len(copied), len(ids))
+            try:
+                planner = Planner(
+                    inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, inputs.global_Ap,
+                    assignment=assignment, parallel=parallel, authorized=authorized, prepared=copied)
+                # Prepared nodes are not changed by planning, assignment is computed on a copy of the tree
+                for node, subtree in ids.items():
+                    prepared.setdefault(subtree, node)
+                results[name] = PlanResult(planner.plan())
+            except PlanningError as e:
+                logging.error('%s: %s', name, e)
+                results[name] = PlanResult(errors=[e])
+    finally:
+        if parallel is not None:
+            parallel.shutdown()
+    return results, shared_subplans(occurrences)
+
+
+def copy_prepared(source, node):
+    for field in PREPARED:
+        setattr(node, field, getattr(source, field))
+    node.eq = set(source.eq)
+    node.candidates = list(source.candidates)
+
+
+# Subplans computed once and shipped to more than one consumer: subtrees occurring more than once in the batch
+# that are not always contained in the same larger shared subtree
+def shared_subplans(occurrences: dict):
+    shared = list()
+    for subtree, nodes in occurrences.items():
+        if len(nodes) < 2:
+            continue
+        parents = {parent for _, _, parent in nodes}
+        if len(parents) == 1 and None not in parents and len(occurrences[next(iter(parents))]) == len(nodes):
+            continue
+        node = nodes[0][1]
+        shared.append({
+            'subplan': node.name, 'operation': node.operation, 'nodes': len(post_order(node)),
+            'consumers': [{'query': name, 'node': consumer.name} for name, consumer, _ in nodes]})
+    # Largest subplans first
+    shared.sort(key=lambda subplan: (-subplan['nodes'], -len(subplan['consumers'])))
+    return shared
+
+
+# Reads the trees of the queries, named after their files, leaves are associated with relations of state
+def read_queries(state: State, tree_files: list):
+    queries = dict()
+    for filename in tree_files:
+        name = os.path.splitext(os.path.basename(filename))[0]
+        count = 1
+        while name in queries:
+            count += 1
+            name = '%s_%d' % (os.path.splitext(os.path.basename(filename))[0], count)
+        try:
+            queries[name] = state.inputs(list(read_csv(filename)))
+        except (OSError, InputError) as e:
+            queries[name] = e if isinstance(e, InputError) else InputError('Cannot read %s: %r' % (filename, e))
+    return queries
+
+
+def multiquery(args):
+    coloredlogs.install(
+        level=args.loglevel, fmt='%(asctime)s [%(funcName)s] %(levelname)s %(message)s', datefmt='%H:%M:%S')
+    state = State(args.input)
+    queries = read_queries(state, args.trees)
+    renderer = None
+    if any(extension in main.PICTURES for extension in args.formats):
+        renderer = export.Renderer()
+    for name, inputs in queries.items():
+        if not isinstance(inputs, InputError):
+            os.makedirs(os.path.join(args.path, name), exist_ok=True)
+            for extension in args.formats:
+                export.export_tree(os.path.join(args.path, name, 'Plan.' + extension), inputs.root, renderer=renderer)
+    results, shared = plan_batch(queries, args.assignment, args.workers)
+    report = {'queries': list(), 'shared': shared}
+    for name, result in results.items():
+        if result.ok:
+            for extension in args.formats:
+                export.export_tree(os.path.join(args.path, name, 'Tree.' + extension), result.plan, renderer=renderer)
+            print('ok     %8s  %s' % (result.cost, name))
+            report['queries'].append({'query': name, 'status': 'ok', 'cost': result.cost})
+        else:
+            print('failed %8s  %s: %s' % ('-', name, '; '.join(str(error) for error in result.errors)))
+            report['queries'].append({
+                'query': name, 'status': 'failed', 'error': '; '.join(str(error) for error in result.errors)})
+    for subplan in shared:
+        print('shared %8d  %s -> %s' % (subplan['nodes'], subplan['subplan'], ', '.join(
+            '%s:%s' % (consumer['query'], consumer['node']) for consumer in subplan['consumers'])))
+    rendered = True
+    if renderer is not None:
+        rendered = not renderer.wait()
+        renderer.shutdown()
+    if args.report is not None:
+        with open(args.report, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0 if rendered and all(result.ok for result in results.values()) else 1
+
+
+def parse_args():
+    parser = ArgumentParser(description='Plan many queries over the same relations, sharing identical subplans')
+    parser.add_argument('trees', nargs='+', metavar='TREE', help="Files with the trees of the queries (as tree.csv)")
+    parser.add_argument(
+        "-i", "--input", metavar='INPUT', dest="input", required=True,
+        help="Path from where read relations, subjects and authorizations")
+    parser.add_argument(
+        "-p", "--path", dest="path", help="Path where to save plans, one directory for each query",
+        metavar="PATH", required=True)
+    parser.add_argument(
+        "-f", "--format", nargs='+', choices=main.FORMATS, default=['json'], metavar='FORMAT', dest="formats",
+        help="Formats of exported plans: " + ', '.join(main.FORMATS) + " (default: json)")
+    parser.add_argument(
+        "-a", "--assignment", choices=['greedy', 'optimal'], default='greedy', dest="assignment",
+        help="Assignment of nodes: greedy visit of the tree or minimum total cost")
+    parser.add_argument(
+        "-w", "--workers", type=int, metavar='N', dest="workers",
+        help="Number of worker processes filtering candidates of nodes (default: no workers)")
+    parser.add_argument(
+        "-r", "--report", metavar='REPORT', dest="report",
+        help="JSON file where to save costs of queries and shared subplans")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '-v', '--verbose', help="Be verbose", action="store_const",
+        dest="loglevel", const=logging.INFO, default=logging.WARNING)
+    group.add_argument(
+        '-d', '--debug', help="Print lots of debugging statements",
+        action="store_const", dest="loglevel", const=logging.DEBUG)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    exit(multiquery(parse_args()))
@@ -1,27 +1,36 @@
+import copy
 import logging
 
-from anytree import NodeMixin
+import attribute
+from tree import PlanTree
+
+
+# Fields of nodes holding attribute sets encoded as bitmasks
+MASK_FIELDS = ('Ap', 'Ae', 'As', 'group_attr', 'attributes', 'vp', 've', 'vE', 'ip', 'ie', 'totAp', 'totAe')
 
 
 # Class representing an operation to be inserted in the tree plan
 class Ops:
-    def __init__(self, operation, Ap: set, Ae: set, As: set, group_attr, select_multi_attr):
+    __slots__ = ('operation', 'Ap', 'Ae', 'As', 'group_attr', 'select_multi_attr')
+
+    def __init__(self, operation, Ap, Ae, As, group_attr, select_multi_attr):
         # Value restriction for operation attribute
         permitted_ops = [
             'projection', 'selection', 'cartesian', 'join',
             'group-by', 'encryption', 'decryption', 're-encryption', 'query']
-        Ap = set(Ap)
-        Ae = set(Ae)
-        As = set(As)
+        # Attribute sets are stored as bitmasks over the attribute universe
+        Ap = attribute.encode(Ap)
+        Ae = attribute.encode(Ae)
+        As = attribute.encode(As)
         if operation.lower() not in permitted_ops:
             raise ValueError('Ops: operation must be one of %r.' % permitted_ops)
         if operation.lower() == 'selection':
             self.select_multi_attr = select_multi_attr
         else:
             self.select_multi_attr = False
-        if len(Ap.intersection(Ae, As)):
+        if Ap & Ae & As:
             raise ValueError('Ops: plain, re_enc and enc sets must be disjoint')
-        self.group_attr = group_attr
+        self.group_attr = attribute.encode(group_attr) if group_attr else 0
         self.Ap = Ap
         self.Ae = Ae
         self.As = As
@@ -41,113 +50,213 @@ class Ops:
         return int(op_cost[self.operation])
 
 
-# Class representing a node of the query plan
-class Node(Ops, NodeMixin):
-    vp = set()
-    ve = set()
-    vE = set()
-    ip = set()
-    ie = set()
-    eq = set()
-    totAp = set()
-    totAe = set()
-    attributes = set()
-    # Candidates authorized for query execution
-    candidates = list()
-    # Base relation
-    relation = None
-    assignee = str()
-    comp_cost = dict()
+# Class representing a node of the query plan. Nodes are linked by the PlanTree they belong to, the tree is
+# traversed with the functions of the tree module.
+class Node(Ops):
+    __slots__ = (
+        'vp', 've', 'vE', 'ip', 'ie', 'eq', 'totAp', 'totAe', 'attributes', 'candidates', 'relation', 'assignee',
+        'subtree_size', 'cost', 'cryptographic', 'size', 'name', 'dirty', 'tree', 'index', 'selectivity', 'rows')
 
     def __init__(
             self, operation, cryptographic=False, print_label=None, group_attr=None, select_multi_attr=False,
-            parent=None, children=None, Ap=None, Ae=None, As=None):
+            parent=None, children=None, Ap=None, Ae=None, As=None, selectivity=None):
         if As is None:
-            As = set()
+            As = 0
         if Ae is None:
-            Ae = set()
+            Ae = 0
         if Ap is None:
-            Ap = set()
+            Ap = 0
         super().__init__(operation, Ap, Ae, As, group_attr, select_multi_attr)
-        self.parent = parent
+        self.vp = 0
+        self.ve = 0
+        self.vE = 0
+        self.ip = 0
+        self.ie = 0
+        self.eq = set()
+        self.totAp = 0
+        self.totAe = 0
+        # Candidates authorized for query execution
+        self.candidates = list()
+        # Base relation
+        self.relation = None
+        self.assignee = str()
+        # Sum of sizes of the nodes in the subtree rooted in the node
+        self.subtree_size = 0
+        # Cost estimated for the assignee of the node
+        self.cost = None
         self.cryptographic = cryptographic
         self.size = 0
-        if print_label is not None:
-            # Used to print the tree
-            self.name = print_label
+        # Fraction of the rows of its children produced by the operation (None if unknown) and estimated rows
+        self.selectivity = selectivity
+        self.rows = None
+        # Used to print the tree
+        self.name = print_label
+        # Profile must be computed (again) since the node is new or its children or their profiles changed
+        self.dirty = True
+        # A new node joins the tree of its parent (or of its children), it is appended as last child of parent
+        if parent is not None:
+            parent.tree.add(self)
+        elif children:
+            next(iter(children)).tree.add(self)
+        else:
+            PlanTree().add(self)
+        self.parent = parent
         if children:
-            self.children = children
-        self.attributes = set(Ap).union(set(Ae)).union(set(As))
-        if group_attr:
-            self.attributes = self.attributes.union(set(group_attr))
+            for child in children:
+                child.parent = self
+        self.attributes = self.Ap | self.Ae | self.As | self.group_attr
+
+    @property
+    def parent(self):
+        parent = self.tree.parents[self.index]
+        return self.tree.nodes[parent] if parent >= 0 else None
+
+    @parent.setter
+    def parent(self, parent):
+        old = self.parent
+        self.tree.attach(self, parent)
+        if parent is not old:
+            for node in old, parent:
+                if node is not None:
+                    node.dirty = True
+
+    @property
+    def children(self):
+        nodes = self.tree.nodes
+        return tuple([nodes[child] for child in self.tree.children[self.index]])
+
+    @property
+    def is_leaf(self):
+        return not self.tree.children[self.index]
+
+    @property
+    def is_root(self):
+        return self.tree.parents[self.index] < 0
+
+    @property
+    def root(self):
+        parents = self.tree.parents
+        position = self.index
+        while parents[position] >= 0:
+            position = parents[position]
+        return self.tree.nodes[position]
+
+    # Leaves of the subtree rooted in the node, in pre-order
+    @property
+    def leaves(self):
+        return self.tree.index().leaves(self)
+
+    @property
+    def descendants(self):
+        return tuple(self.tree.pre_order(self)[1:])
+
+    # Attribute sets are pickled by name: bitmasks depend on the order attributes are interned by a process
+    def __getstate__(self):
+        state = dict()
+        for field in Ops.__slots__ + Node.__slots__:
+            if hasattr(self, field):
+                state[field] = getattr(self, field)
+        for field in MASK_FIELDS:
+            if field in state:
+                state[field] = attribute.names(state[field])
+        if 'eq' in state:
+            state['eq'] = [attribute.names(eq) for eq in state['eq']]
+        return state
+
+    def __setstate__(self, state):
+        for field in MASK_FIELDS:
+            if field in state:
+                state[field] = attribute.encode(state[field])
+        if 'eq' in state:
+            state['eq'] = {attribute.encode(eq) for eq in state['eq']}
+        for field, value in state.items():
+            setattr(self, field, value)
+
+    # Copies of nodes share immutable fields (bitmasks, names and prices), they are not converted as when pickled
+    def __deepcopy__(self, memo):
+        node = Node.__new__(Node)
+        memo[id(self)] = node
+        for field in Ops.__slots__ + Node.__slots__:
+            if hasattr(self, field):
+                setattr(node, field, getattr(self, field))
+        node.eq = set(self.eq)
+        node.candidates = list(self.candidates)
+        node.relation = copy.deepcopy(self.relation, memo)
+        node.tree = copy.deepcopy(self.tree, memo)
+        return node
+
+    # Computational cost of the subtree rooted in the node when evaluated by a subject with comp_price
+    def comp_cost(self, comp_price):
+        return comp_price * self.subtree_size
 
     # Computes the profile of a node (according to def 2.2)
     def compute_profile(self):
         logging.debug('Computing profile for node %s', self.name)
-        self.vp = set()
-        self.ve = set()
-        self.vE = set()
-        self.ip = set()
-        self.ie = set()
+        old = self.vp, self.ve, self.vE, self.ip, self.ie, self.eq
+        self.vp = 0
+        self.ve = 0
+        self.vE = 0
+        self.ip = 0
+        self.ie = 0
         self.eq = set()
         # leaf nodes are projections
         if self.is_leaf:
-            self.vp = set(self.relation.plain_attr)
-            self.ve = set()
-            self.vE = set(self.relation.enc_attr)
-            self.ip = set()
-            self.ie = set()
-            self.eq = set()
+            self.vp = self.relation.plain_mask
+            self.vE = self.relation.enc_mask
         else:
             # Copy profiles from children
             for child in self.children:
-                self.vp = self.vp.union(child.vp)
-                self.ve = self.ve.union(child.ve)
-                self.vE = self.vE.union(child.vE)
-                self.ip = self.ip.union(child.ip)
-                self.ie = self.ie.union(child.ie)
-                self.eq = self.eq.union(child.eq)
+                self.vp |= child.vp
+                self.ve |= child.ve
+                self.vE |= child.vE
+                self.ip |= child.ip
+                self.ie |= child.ie
+                self.eq |= child.eq
         # If an attribute has to be evaluated in plain, add it to vp
-        if len(self.Ap) and not self.cryptographic:
-            self.vp = self.vp.union(self.Ap)
-            self.ve = self.ve.difference(self.Ap)
-            self.vE = self.vE.difference(self.Ap)
+        if self.Ap and not self.cryptographic:
+            self.vp |= self.Ap
+            self.ve &= ~self.Ap
+            self.vE &= ~self.Ap
         # If an attribute has to be evaluated re-encrypted, add it to ve
-        if len(self.Ae) and not self.cryptographic:
-            self.ve = self.ve.union(self.Ae)
-            self.vE = self.vE.difference(self.Ae)
+        if self.Ae and not self.cryptographic:
+            self.ve |= self.Ae
+            self.vE &= ~self.Ae
         # Start to calculate profiles
         if self.operation == 'projection':
-            self.vp = self.vp.intersection(self.attributes)
-            self.ve = self.ve.intersection(self.attributes)
-            self.vE = self.vE.intersection(self.attributes)
+            self.vp &= self.attributes
+            self.ve &= self.attributes
+            self.vE &= self.attributes
         elif self.operation == 'selection' and not self.select_multi_attr:
-            self.ip = self.ip.union(self.vp.intersection(self.attributes))
-            self.ie = self.ie.union(self.ve.union(self.vE).intersection(self.attributes))
+            self.ip |= self.vp & self.attributes
+            self.ie |= (self.ve | self.vE) & self.attributes
         elif self.operation == 'selection' and self.select_multi_attr:
-            self.eq.add(frozenset(self.attributes))
+            self.eq.add(self.attributes)
         elif self.operation == 'cartesian':
             # Union of sets of children, already done by __assign_profile
             pass
         elif self.operation == 'join':
             # Union of first 5 sets already done by __assign_profile
-            self.eq.add(frozenset(self.attributes))
+            self.eq.add(self.attributes)
         elif self.operation == 'group-by':
-            self.vp = self.vp.intersection(self.attributes)
-            self.ve = self.ve.intersection(self.attributes)
-            self.vE = self.vE.intersection(self.attributes)
-            self.ip = self.ip.union(self.vp.intersection(self.group_attr))
-            self.ie = self.ie.union(self.ve.union(self.vE).intersection(self.group_attr))
+            self.vp &= self.attributes
+            self.ve &= self.attributes
+            self.vE &= self.attributes
+            self.ip |= self.vp & self.group_attr
+            self.ie |= (self.ve | self.vE) & self.group_attr
         elif self.operation == 'encryption':
             # Enc nodes have all attributes in Ap
-            self.vp = self.vp.difference(self.attributes)
-            self.ve = self.ve.union(self.attributes)
+            self.vp &= ~self.attributes
+            self.ve |= self.attributes
         elif self.operation == 'decryption':
             # Dec nodes have all attributes in Ae
-            self.vp = self.vp.union(self.attributes)
-            self.ve = self.ve.difference(self.attributes)
-            self.vE = self.vE.difference(self.attributes)
+            self.vp |= self.attributes
+            self.ve &= ~self.attributes
+            self.vE &= ~self.attributes
         elif self.operation == 're-encryption':
             # Re_enc nodes have all attributes in Ae
-            self.ve = self.ve.union(self.attributes)
-            self.vE = self.vE.difference(self.attributes)
+            self.ve |= self.attributes
+            self.vE &= ~self.attributes
+        self.dirty = False
+        # Profile of parent depends on the profile of the node
+        if (self.vp, self.ve, self.vE, self.ip, self.ie, self.eq) != old and not self.is_root:
+            self.parent.dirty = True
@@ -0,0 +1,76 @@
+import logging
+
+import numpy as np
+
+from catalog import Catalog
+from costs import CostModel
+from node import Node
+from tree import pre_order
+
+
+# Assignment of minimum total cost of the nodes of the tree rooted in root (child of the query node), returned as
+# node -> assignee to be applied by compute_assignment. It is computed bottom-up over
+# (node, assignee) states: the cost of the subtree of a node for one of its candidates is the cost of the work of
+# the node alone (see CostModel.static_costs with own) plus, for every child, the cheaper of keeping the same
+# assignee (no transfer) and the cheapest candidate of the child including its transfer cost. Only these two options of a child survive, so the computation is linear in
+# the number of candidates of each node. Costs of re-encryption of attributes pushed down by ancestors depend on
+# the order of visit of the tree and are not part of the optimization, they are added when the assignment is
+# applied by compute_assignment.
+def optimal_assignment(
+        root: Node, subjects: dict, authorizations: dict, catalog: Catalog,
+        avg_comp_price: float, avg_transfer_price: float):
+    logging.info('Computing optimal assignment...')
+    model = CostModel(subjects, authorizations, catalog, avg_comp_price, avg_transfer_price)
+    nodes = pre_order(root)
+    scheduled = [node for node in nodes if not node.is_leaf and not node.cryptographic]
+    candidates = {node: np.array([model.index[cand] for cand in node.candidates]) for node in scheduled}
+    # Cost of the work of every node for each of its candidates, then of its subtree
+    best = dict()
+    for start in range(0, len(scheduled), model.block_size):
+        block = scheduled[start:start + model.block_size]
+        for node, costs in zip(block, model.static_costs(block, own=True)):
+            # Undefined costs are reported when the assignment is applied
+            best[node] = np.nan_to_num(costs[candidates[node]], nan=np.inf)
+    # Transfer cost of every candidate of a node and cheapest candidate including it (position, cost)
+    transfer = dict()
+    cheapest = dict()
+    # Cost of the subtrees of nodes that are not assigned (leaves), which do not depend on their parent
+    fixed = dict()
+    stay = np.full(len(model.subjects), np.inf)
+    # Descendants are visited before their ancestors
+    for node in reversed(nodes):
+        if node not in best:
+            fixed[node] = sum(__child_cost(child, cheapest, fixed) for child in node.children)
+            continue
+        for child in node.children:
+            if child not in best:
+                best[node] += fixed[child]
+                continue
+            # Keeping the assignee of the parent or moving the child to its cheapest candidate
+            stay[candidates[child]] = best[child]
+            best[node] += np.minimum(cheapest[child][1], stay[candidates[node]])
+            stay[candidates[child]] = np.inf
+        transfer[node] = node.size * model.transfer_price[candidates[node]]
+        total = best[node] + transfer[node]
+        position = int(np.argmin(total))
+        cheapest[node] = position, total[position]
+    # Assignees are chosen top-down, the parent of root is assigned to the user
+    assignees = dict()
+    for node in nodes:
+        if node not in best:
+            continue
+        parent = node.parent.assignee if node.parent is root.parent else assignees.get(node.parent)
+        cands = candidates[node]
+        position = cheapest[node][0]
+        if parent in node.candidates:
+            same = node.candidates.index(parent)
+            if best[node][same] <= cheapest[node][1]:
+                position = same
+        assignees[node] = model.subjects[cands[position]]
+    return assignees
+
+
+def __child_cost(child, cheapest, fixed):
+    if child in cheapest:
+        return cheapest[child][1]
+    return fixed[child]
@@ -0,0 +1,58 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from authorization import class_flags
+
+
+# Flags of the authorized candidates of a list of (flags of classes, classes of candidates), in a worker process
+def check_chunk(pieces: list):
+    return [flags[candidate_classes] for flags, candidate_classes in pieces]
+
+
+# Candidates of nodes ready to be evaluated (whose subtrees are independent) filtered by their authorized classes
+# in a pool of worker processes, in chunks of about chunk_size subjects (of one or more nodes). Candidates of a
+# level are filtered by workers only if they are at least min_work in total (two chunks by default): sending
+# candidates to a worker costs more than filtering them in the caller, which is worth it for large levels only.
+# The pool is kept until shutdown, by the owner of the checker (see Planner.close).
+class ParallelChecker:
+    def __init__(self, workers=None, chunk_size=1 << 16, min_work=None):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.min_work = min_work if min_work is not None else 2 * chunk_size
+        self.pool = None
+
+    # Authorized candidates (positions of subjects) of every node, given as (authorized classes, candidates), or
+    # None if they are too few to be filtered by workers
+    def members(self, nodes: list, subject_classes, n_classes: int):
+        if sum(len(candidates) for _, candidates in nodes) < self.min_work:
+            return None
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Candidates of every node are split in pieces, pieces are grouped in chunks of about chunk_size subjects
+        chunks = [list()]
+        size = 0
+        for index, (authorized_classes, candidates) in enumerate(nodes):
+            flags = class_flags(authorized_classes, n_classes)
+            for start in range(0, len(candidates), self.chunk_size):
+                if size >= self.chunk_size:
+                    chunks.append(list())
+                    size = 0
+                piece = candidates[start:start + self.chunk_size]
+                chunks[-1].append((index, piece, flags))
+                size += len(piece)
+        logging.debug('Filtering candidates of %d nodes in %d chunks by worker processes...', len(nodes), len(chunks))
+        futures = [
+            self.pool.submit(check_chunk, [(flags, subject_classes[piece]) for _, piece, flags in chunk])
+            for chunk in chunks]
+        selected = [list() for _ in nodes]
+        for chunk, future in zip(chunks, futures):
+            for (index, piece, _), authorized in zip(chunk, future.result()):
+                selected[index].append(piece[authorized])
+        return [np.concatenate(pieces) if pieces else candidates for pieces, (_, candidates) in zip(selected, nodes)]
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
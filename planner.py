@@ -0,0 +1,251 @@
+import copy
+import logging
+
+import attribute
+import procedures as p
+from authorization import AuthorizationCache
+from cache import fingerprint
+from catalog import Catalog
+from errors import InputError, PlanningError
+from input import read_input, sort_subjects
+from node import Node
+from optimal import optimal_assignment
+from parallel import ParallelChecker
+from tree import post_order, pre_order
+
+
+# Inserts a node as parent of root assigned to the user formulating the query, who sees the attributes of the result
+# in plaintext (root must have its profile)
+def add_query_node(root: Node):
+    Node('query', Ap=root.vp | root.ve | root.vE, print_label='User formulating the query', children={root})
+    root.parent.assignee = 'U'
+
+
+# Input data of the algorithm, as returned by read_input. The tree is consumed by planning.
+class Inputs:
+    def __init__(self, root: Node, catalog: Catalog, prices: dict, authorizations: dict, global_Ap: int):
+        self.root = root
+        self.catalog = catalog
+        self.prices = prices
+        self.authorizations = authorizations
+        self.global_Ap = global_Ap
+
+    @staticmethod
+    def read(input_path):
+        try:
+            return Inputs(*read_input(input_path))
+        except (OSError, ValueError, KeyError) as e:
+            raise InputError('Cannot read input from %s: %r' % (input_path, e)) from e
+
+
+# Result of planning: final tree, total cost of the assignment and errors that stopped the computation
+class PlanResult:
+    def __init__(self, plan=None, errors=None, cached=False):
+        self.plan = plan
+        self.errors = errors if errors is not None else list()
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.plan is not None and not self.errors
+
+    # Assignee of every node of the final tree, in pre-order
+    @property
+    def assignments(self):
+        if self.plan is None:
+            return list()
+        return [(node, node.assignee) for node in pre_order(self.plan)]
+
+    # Total cost of the plan: sum of the costs of the work of every node for its assignee (see CostModel.own_cost)
+    @property
+    def cost(self):
+        if self.plan is None:
+            return None
+        return sum(node.cost for node in pre_order(self.plan) if node.cost is not None)
+
+
+# Computes the plan of inputs (an Inputs object or the path of an input directory), reusing plans in plan_cache.
+# Nodes are assigned by the greedy visit of compute_assignment or by optimal_assignment ('optimal').
+# With workers, authorization checks of candidates are computed by that number of worker processes.
+def plan(inputs, manual_assignment=None, plan_cache=None, assignment='greedy', workers=None):
+    try:
+        if not isinstance(inputs, Inputs):
+            inputs = Inputs.read(inputs)
+        key = None
+        if plan_cache is not None:
+            key = fingerprint(
+                inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, manual_assignment, assignment)
+            cached = plan_cache.get(key)
+            if cached is not None:
+                return PlanResult(cached, cached=True)
+        # Identify candidates, compute size and cost of nodes, assign them and inject encryption/decryption operations
+        planner = Planner(
+            inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, inputs.global_Ap,
+            manual_assignment, assignment, workers)
+        try:
+            result = planner.plan()
+        finally:
+            planner.close()
+        if plan_cache is not None:
+            plan_cache.put(key, result)
+        return PlanResult(result)
+    except PlanningError as e:
+        logging.error('%s', e)
+        return PlanResult(errors=[e])
+
+
+# Planner keeping the state of the plan that does not depend on subjects (profiles, sizes and costs of nodes)
+# and the results of authorization checks, so that changes of subjects, prices and authorizations only
+# recompute what they affect. Results are the same of a full execution of the algorithm.
+# Results of authorization checks can be shared with other planners by authorized, nodes in prepared already have
+# profiles, sizes, costs and candidates (copied from identical subtrees, see multiquery).
+# With workers, the planner keeps a pool of worker processes filtering candidates until close, a ParallelChecker
+# given by parallel is shared with other planners and shut down by its owner.
+class Planner:
+    def __init__(
+            self, root: Node, catalog: Catalog, prices: dict, authorizations: dict, global_Ap: int,
+            manual_assignment=None, assignment='greedy', workers=None, authorized=None, prepared=None,
+            parallel=None):
+        if assignment not in ('greedy', 'optimal'):
+            raise ValueError('Planner: unknown assignment %s' % assignment)
+        self.catalog = catalog
+        self.prices = dict(prices)
+        self.authorizations = dict(authorizations)
+        self.manual_assignment = manual_assignment
+        self.assignment = assignment
+        self.parallel = parallel
+        self.own_parallel = parallel is None and workers is not None
+        if self.own_parallel:
+            self.parallel = ParallelChecker(workers)
+        self.subjects, self.avg_comp_price, self.avg_transfer_price = sort_subjects(self.prices)
+        # Results of authorization checks, by profile of nodes and authorization
+        self.authorized = authorized if authorized is not None else AuthorizationCache()
+        self.result = None
+        self.root = root
+        # Profiles, sizes and costs of nodes are computed once
+        p.compute_profiles(root, global_Ap, prepared)
+        if root.parent is None:
+            add_query_node(root)
+        p.comp_size(root, catalog, prepared)
+        p.compute_cost(root, prepared)
+        try:
+            p.select_candidates(root, self.subjects, self.authorizations, self.authorized, self.parallel, prepared)
+        except Exception:
+            self.close()
+            raise
+
+    # Shuts down the worker processes of the planner, they are started again by later changes of subjects
+    def close(self):
+        if self.own_parallel:
+            self.parallel.shutdown()
+
+    # Returns the final plan, computing assignment and encryption on a copy of the prepared tree
+    def plan(self):
+        if self.result is not None:
+            return self.result
+        logging.info('Computing assignment of the plan...')
+        # Relations are shared with the catalog, they are not copied
+        memo = {id(relation): relation for relation in self.catalog.relations}
+        root = copy.deepcopy(self.root.root, memo).children[0]
+        manual_assignment = None
+        assignees = None
+        if self.manual_assignment is not None:
+            manual_assignment = self.__manual_assignment(root)
+        elif self.assignment == 'optimal':
+            assignees = optimal_assignment(
+                root, self.subjects, self.authorizations, self.catalog, self.avg_comp_price, self.avg_transfer_price)
+        p.compute_assignment(
+            root, self.subjects, self.authorizations, self.catalog,
+            self.avg_comp_price, self.avg_transfer_price, manual_assignment, assignees)
+        p.insert_encryption(self.authorizations, self.catalog, root, self.subjects)
+        p.extend_plan(root.root, self.authorizations)
+        p.refresh_profiles(root)
+        self.result = root.root
+        return self.result
+
+    # Manual assignment as a list of known subjects, one for each node assigned by compute_assignment (in pre-order)
+    def __manual_assignment(self, root):
+        try:
+            manual_assignment = list(self.manual_assignment)
+        except TypeError as e:
+            raise InputError(
+                'Manual assignment must be a sequence of subjects, not %r' % (self.manual_assignment,)) from e
+        nodes = len(pre_order(root, filter_=lambda n: not n.is_leaf and not n.cryptographic))
+        if len(manual_assignment) != nodes:
+            raise InputError(
+                'Manual assignment of %d subject(s) for %d nodes' % (len(manual_assignment), nodes))
+        unknown = [
+            str(subject) for subject in manual_assignment
+            if subject not in self.subjects or subject not in self.authorizations]
+        if unknown:
+            raise InputError('Manual assignment to unknown subject(s): %s' % ', '.join(unknown))
+        return manual_assignment
+
+    def add_subject(self, subject, comp_price, transfer_price, plain='', enc=''):
+        logging.info('Adding subject %s', subject)
+        if subject in self.prices:
+            raise ValueError('Planner: subject %s already exists' % subject)
+        return self.__update(subject, {'comp_price': comp_price, 'transfer_price': transfer_price}, {
+            'plain': attribute.encode(plain), 'enc': attribute.encode(enc)})
+
+    def remove_subject(self, subject):
+        logging.info('Removing subject %s', subject)
+        return self.__update(subject, None, None)
+
+    def set_prices(self, subject, comp_price, transfer_price):
+        logging.info('Changing prices of subject %s', subject)
+        return self.__update(
+            subject, {'comp_price': comp_price, 'transfer_price': transfer_price}, self.authorizations[subject])
+
+    def set_authorization(self, subject, plain, enc):
+        logging.info('Changing authorization of subject %s', subject)
+        return self.__update(
+            subject, self.prices[subject], {'plain': attribute.encode(plain), 'enc': attribute.encode(enc)})
+
+    # Applies a change of a subject (None price removes it) and invalidates the plan if affected by it
+    def __update(self, subject, price, authorization):
+        old_authorization = self.authorizations.get(subject)
+        old_avg = self.avg_comp_price, self.avg_transfer_price
+        old_candidates = self.__candidates()
+        if price is None:
+            del self.prices[subject]
+            del self.authorizations[subject]
+        else:
+            self.prices[subject] = price
+            self.authorizations[subject] = authorization
+        self.subjects, self.avg_comp_price, self.avg_transfer_price = sort_subjects(self.prices)
+        # Authorizations already checked against the profiles of nodes are not checked again
+        try:
+            p.select_candidates(self.root, self.subjects, self.authorizations, self.authorized, self.parallel)
+        except PlanningError:
+            self.result = None
+            raise
+        if self.__affects_plan(subject, old_authorization, authorization, old_avg, old_candidates):
+            self.result = None
+        else:
+            logging.info('Change of subject %s does not affect the plan', subject)
+            # Leaves have every subject as candidate
+            for node in post_order(self.result, filter_=lambda n: n.is_leaf):
+                node.candidates = list(self.subjects.keys())
+        return self.plan()
+
+    # Candidates of non leaf nodes
+    def __candidates(self):
+        return [node.candidates for node in pre_order(self.root) if not node.is_leaf]
+
+    # A subject affects assignment if it is (or was) candidate of a node, it prices encryption as storage provider
+    # or user, it changes median prices or it can re-encrypt attributes stored encrypted at leaves
+    def __affects_plan(self, subject, old_authorization, authorization, old_avg, old_candidates):
+        if self.result is None:
+            return True
+        candidates = self.__candidates()
+        if candidates != old_candidates or any(subject in cand for cand in candidates):
+            return True
+        if subject == 'U' or any(rel.storage_provider == subject for rel in self.catalog.relations):
+            return True
+        if old_avg != (self.avg_comp_price, self.avg_transfer_price):
+            return True
+        for auth in old_authorization, authorization:
+            if auth is not None and auth['plain'] & self.catalog.enc_mask:
+                return True
+        return False
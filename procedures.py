@@ -1,276 +1,360 @@
-import itertools
 import logging
-import math
 
-from anytree import PostOrderIter, PreOrderIter
+import numpy as np
 
+import attribute
+import metrics
+from authorization import AuthorizationCache, members, requirements
+from cardinality import estimate_rows
+from catalog import Catalog
+from costs import CostModel
+from errors import NoCandidatesError, ReEncryptionError
 from node import Node
+from parallel import ParallelChecker
+from tree import iter_post_order, iter_pre_order, post_order, pre_order
 
 
-def compute_cost(root, subjects: dict):
+@metrics.timed('compute_cost')
+def compute_cost(root, skip=None):
     logging.info('Computing costs of subjects...')
-    for node in PostOrderIter(root):
-        node.comp_cost = dict()
+    # Cost of a node for a subject is comp_price * subtree_size (see Node.comp_cost)
+    nodes = __prepare_order(root, skip)
+    for node in nodes:
         logging.debug('Processing costs on node %s', node.name)
-        for subject in subjects:
-            # Node cost
-            node.comp_cost[subject] = (subjects[subject]['comp_price'] * node.size)
-            # Children costs
-            for child in node.children:
-                node.comp_cost[subject] = node.comp_cost[subject] + child.comp_cost[subject]
+        node.subtree_size = node.size
+        for child in node.children:
+            node.subtree_size += child.subtree_size
+    metrics.add(nodes=len(nodes))
+
+
+def identify_candidates(root: Node, subjects: dict, authorizations: dict, global_Ap: int):
+    compute_profiles(root, global_Ap)
+    select_candidates(root, subjects, authorizations)
 
 
-def identify_candidates(root: Node, subjects: dict, authorizations: dict, global_Ap: set):
-    for node in PostOrderIter(root):
-        logging.info('Identifying candidate on node %s', node.name)
+# Profiles of nodes before assignment, they depend only on the tree and not on subjects
+@metrics.timed('compute_profiles')
+def compute_profiles(root: Node, global_Ap: int, skip=None):
+    nodes = __prepare_order(root, skip)
+    for node in nodes:
+        logging.debug('Computing initial profile on node %s', node.name)
         if node.is_leaf:
             # Initializes profile of base projections (overriding them with encryption of all possible attributes)
-            node.vp = set(global_Ap).difference(node.relation.enc_attr).intersection(node.attributes)
-            node.ve = set(node.relation.plain_attr).difference(global_Ap).intersection(node.attributes)
-            node.vE = set(node.relation.enc_attr).intersection(node.attributes)
-            node.ip = set()
-            node.ie = set()
+            node.vp = global_Ap & ~node.relation.enc_mask & node.attributes
+            node.ve = node.relation.plain_mask & ~global_Ap & node.attributes
+            node.vE = node.relation.enc_mask & node.attributes
+            node.ip = 0
+            node.ie = 0
             node.eq = set()
-            # Candidates are any subject
-            node.candidates = list(subjects.keys())
+            # Profile differs from the one computed by compute_profile
+            node.dirty = True
             # No need to initialize totap and totae (already empty)
         else:
             # Ap and Ae already initialized
             # Attributes are already encrypted
             node.compute_profile()
             for child in node.children:
-                node.totAp = node.Ap.union(child.totAp)
-                node.totAe = node.Ae.union(child.totAe)
-            # Initialize candidates to empty
-            node.candidates = list()
+                node.totAp = node.Ap | child.totAp
+                node.totAe = node.Ae | child.totAe
+    metrics.add(nodes=len(nodes))
+
+
+# Selects authorized candidates of nodes, results of authorization checks can be kept in authorized
+# to be reused by later selections. Nodes are evaluated by levels (height in the tree), nodes of a level have
+# independent subtrees and their candidates can be filtered in parallel by worker processes.
+# Candidates are handled as positions in subjects, so that the classes of all the candidates of a node are
+# tested at once.
+@metrics.timed('select_candidates')
+def select_candidates(
+        root: Node, subjects: dict, authorizations: dict, authorized: AuthorizationCache = None,
+        parallel: ParallelChecker = None, skip=None):
+    if authorized is None:
+        authorized = AuthorizationCache()
+    classes = authorized.classify(authorizations)
+    names = np.array(list(subjects.keys()), dtype=object)
+    subject_classes = np.array([classes[subject] for subject in subjects], dtype=np.int64)
+    position = {subject: i for i, subject in enumerate(subjects)}
+    # Candidates (positions) of the nodes selected so far
+    selected = dict()
+    nodes = __prepare_order(root, skip)
+    evaluations = 0
+    checks = authorized.checks
+    for level in __levels(nodes):
+        pending = list()
+        for node in level:
+            logging.info('Identifying candidate on node %s', node.name)
+            if node.is_leaf:
+                # Candidates are any subject
+                node.candidates = list(subjects.keys())
+                selected[node] = np.arange(len(names))
+                continue
             # Monotonicity property
-            cand = list(subjects.keys())
+            cand = np.arange(len(names))
             if len(node.children) == 1:
-                if node.children[0].Ap.issubset(node.ip):
-                    cand = node.children[0].candidates.copy()
+                if not node.children[0].Ap & ~node.ip:
+                    cand = __positions(node.children[0], selected, position)
             else:
-                if node.children[0].Ap.union(node.children[1].Ap).issubset(node.ip):
-                    cand = node.children[0].candidates.copy()
-                    for candidate in node.children[1].candidates:
-                        if candidate not in cand:
-                            cand.append(candidate)
-            for subject in cand:
-                if __is_authorized(authorizations[subject], node):
-                    node.candidates.append(subject)
+                if not (node.children[0].Ap | node.children[1].Ap) & ~node.ip:
+                    first = __positions(node.children[0], selected, position)
+                    second = __positions(node.children[1], selected, position)
+                    cand = np.concatenate((first, second[~np.isin(second, first)]))
+            evaluations += len(cand)
+            pending.append((node, cand, authorized.authorized_classes(requirements(node))))
+        n_classes = len(authorized.authorizations)
+        candidates = None
+        if parallel is not None:
+            candidates = parallel.members(
+                [(authorized_classes, cand) for _, cand, authorized_classes in pending], subject_classes, n_classes)
+        if candidates is None:
+            candidates = [
+                members(authorized_classes, cand, subject_classes, n_classes)
+                for _, cand, authorized_classes in pending]
+        for (node, _, _), cand in zip(pending, candidates):
+            selected[node] = cand
+            node.candidates = names[cand].tolist()
             logging.debug('Final candidate(s) for %s: %s', node.name, node.candidates)
-            # If node has no candidates, print error and stop the computation
-            if len(node.candidates) == 0:
-                print('No candidates available for node ' + node.name)
-                exit()
+    metrics.add(nodes=len(nodes), candidate_evaluations=evaluations, authorization_checks=authorized.checks - checks)
+    # If node has no candidates, stop the computation (at the first one in post-order)
+    for node in post_order(root):
+        if not node.is_leaf and len(node.candidates) == 0:
+            raise NoCandidatesError(node)
+
+
+# Candidates of a node as positions in subjects, nodes not selected by this selection (see skip) have them as names
+def __positions(node: Node, selected: dict, position: dict):
+    if node in selected:
+        return selected[node]
+    return np.array([position[subject] for subject in node.candidates], dtype=np.int64)
+
+
+# Nodes of the subtree rooted in root to be prepared (profiles, sizes, costs and candidates) in post-order,
+# nodes in skip are already prepared (e.g. copied from an identical subtree)
+def __prepare_order(root: Node, skip):
+    if skip:
+        return post_order(root, filter_=lambda node: node not in skip)
+    return post_order(root)
+
+
+# Nodes (in post-order) grouped by height in the tree, from leaves to root
+def __levels(nodes: list):
+    height = dict()
+    levels = list()
+    for node in nodes:
+        height[node] = 1 + max((height.get(child, -1) for child in node.children), default=-1)
+        if height[node] == len(levels):
+            levels.append(list())
+        levels[height[node]].append(node)
+    return levels
 
 
+@metrics.timed('compute_assignment')
 def compute_assignment(
-        root: Node, subjects: dict, authorizations: dict, relations: list,
-        avg_comp_price: float, avg_transfer_price: float, manual_assignment=None):
-    to_enc_dec = set()
-    for node in PreOrderIter(root):
+        root: Node, subjects: dict, authorizations: dict, catalog: Catalog,
+        avg_comp_price: float, avg_transfer_price: float, manual_assignment=None, assignees=None):
+    to_enc_dec = 0
+    visited = 0
+    inserted = 0
+    authorized = AuthorizationCache()
+    classes = authorized.classify(authorizations)
+    # Costs of nodes for every subject are evaluated in blocks, following the visit order
+    model = CostModel(subjects, authorizations, catalog, avg_comp_price, avg_transfer_price)
+    model.schedule(pre_order(root, filter_=lambda n: not n.is_leaf and not n.cryptographic))
+    # Nodes inserted while visiting the tree are visited too
+    for node in iter_pre_order(root):
         logging.info('Computing assignee for node %s', node.name)
-        s_min = None
-        min_cost = math.inf
+        visited += 1
         if node.is_leaf:
             # Assign node to the storage provider
             node.assignee = node.relation.storage_provider
             # Base relation of the node contains attributes to be re-encrypted
-            if len(to_enc_dec.intersection(set(node.relation.enc_attr))):
-                att = to_enc_dec.intersection(set(node.relation.enc_attr))
+            if to_enc_dec & node.relation.enc_mask:
+                att = to_enc_dec & node.relation.enc_mask
+                required = requirements(node)
                 for cand in subjects.keys():
                     # Candidates are already sorted by comp+transfer price
-                    re_enc = att.intersection(set(authorizations[cand]['plain']))
-                    if len(re_enc) and __is_authorized(authorizations[cand], node):
+                    re_enc = att & authorizations[cand]['plain']
+                    if re_enc and authorized.is_authorized(classes[cand], required):
                         # Insert re-encryption node for 'dec' as parent of current node
-                        logging.debug('Inserting a re-encryption node for attribute(s) %s', re_enc)
+                        logging.debug('Inserting a re-encryption node for attribute(s) %s', attribute.decode(re_enc))
                         n = Node(
-                            operation='re-encryption', Ap=set(), Ae=re_enc, As=set(), cryptographic=True,
-                            print_label='Re-encrypt ' + str(re_enc), parent=node.parent, children={node})
+                            operation='re-encryption', Ap=0, Ae=re_enc, As=0, cryptographic=True,
+                            print_label='Re-encrypt ' + str(attribute.decode(re_enc)), parent=node.parent,
+                            children={node})
                         n.assignee = cand
                         n.compute_profile()
+                        inserted += 1
                         # This line in the paper was one indentation back
-                        att = att.difference(re_enc)
-                        to_enc_dec = to_enc_dec.difference(re_enc)
-                if len(att):
-                    print('Error: %s attributes cannot be re-encrypted' % att)
-                    exit()
+                        att &= ~re_enc
+                        to_enc_dec &= ~re_enc
+                if att:
+                    raise ReEncryptionError(attribute.decode(att))
         elif not node.cryptographic:
-            for cand in node.candidates:
-                # Calculate transfer cost of relation
-                if cand != node.parent.assignee:
-                    cost = node.size * subjects[cand]['transfer_price']
-                else:
-                    cost = 0
-                cost += node.comp_cost[cand]  # Calculate computational cost
-                for attr in node.totAp.union(node.totAe).intersection(set(authorizations[cand]['plain'])):
-                    for rel in relations:  # S decrypts the attribute
-                        if attr in rel.enc_attr:
-                            cost += int(rel.dec_costs[rel.attr.index(attr)]) * subjects[cand]['comp_price']
-                for attr in node.totAe.difference(set(authorizations[cand]['plain'])):
-                    for rel in relations:  # Need to delegate re-encryption of attribute
-                        if attr in rel.enc_attr:
-                            index = rel.attr.index(attr)
-                            cost += (int(rel.dec_costs[index]) + int(rel.enc_costs[index])) \
-                                    * avg_comp_price + int(rel.size[index]) \
-                                    * (avg_transfer_price + int(subjects[cand]['transfer_price']))
-                enc = node.ve.union(node.ie)
-                for child in node.children:
-                    enc = enc.union(child.ve).union(node.ie)
-                for attr in enc.intersection(set(authorizations[cand]['enc'])):
-                    for rel in relations:  # Need to delegate encryption of attribute
-                        if attr in rel.plain_attr:
-                            index = rel.attr.index(attr)
-                            cost += int(rel.enc_costs[index]) \
-                                    * subjects[rel.storage_provider]['comp_price']
-                            # Decryption cost of attributes performed by User to see query result
-                            cost += int(rel.dec_costs[rel.attr.index(attr)]) * subjects['U']['comp_price']
-                for attr in to_enc_dec.intersection(authorizations[cand]['plain']):  # S can re-encrypt attribute
-                    for rel in relations:
-                        if attr in rel.enc_attr:
-                            index = rel.attr.index(attr)
-                            cost += (int(rel.dec_costs[index]) + int(rel.enc_costs[index])) \
-                                    * subjects[cand]['comp_price']
-                if cost < min_cost:
-                    min_cost = cost
-                    s_min = cand
-            node.assignee = s_min  # Select subject with minimum cost for evaluate current node
+            if assignees is not None:
+                # Assignee chosen before visiting the tree (see optimal_assignment)
+                node.assignee = assignees[node]
+            else:
+                s_min, _ = model.cheapest(node, to_enc_dec)
+                node.assignee = s_min  # Select subject with minimum cost for evaluate current node
             # Manual assignment of candidates, used only for debug
             if manual_assignment is not None:
                 node.assignee = manual_assignment.pop(0)
+            # Cost of the node in the plan: its own work, not the one of its subtree compared by the greedy visit
+            node.cost = model.own_cost(node, to_enc_dec, node.assignee)
             # Insert re-encryption node for to_enc_dec attributes pushed down
-            if len(to_enc_dec.intersection(set(authorizations[node.assignee]['plain']))):
-                Ae = to_enc_dec.intersection(set(authorizations[node.assignee]['plain']))
-                logging.debug('Inserting a re-encryption node for attribute(s) %s', Ae)
+            plain = authorizations[node.assignee]['plain']
+            if to_enc_dec & plain:
+                Ae = to_enc_dec & plain
+                logging.debug('Inserting a re-encryption node for attribute(s) %s', attribute.decode(Ae))
                 n = Node(
-                    operation='re-encryption', Ap=set(), Ae=Ae, As=set(), cryptographic=True,
-                    print_label='Re-encrypt ' + str(Ae), parent=node.parent, children={node})
+                    operation='re-encryption', Ap=0, Ae=Ae, As=0, cryptographic=True,
+                    print_label='Re-encrypt ' + str(attribute.decode(Ae)), parent=node.parent, children={node})
                 n.assignee = node.assignee
                 n.compute_profile()
-                to_enc_dec = to_enc_dec.difference(set(authorizations[node.assignee]['plain']))
-            to_enc_dec = to_enc_dec.union(node.Ae.difference(set(authorizations[node.assignee]['plain'])))
+                inserted += 1
+                to_enc_dec &= ~plain
+            to_enc_dec |= node.Ae & ~plain
             # Insert re-encryption node for attributes that need to be re-encrypted
-            if len(node.Ae.intersection(set(authorizations[node.assignee]['plain']))):
-                # Need to search correct path in the tree
+            if node.Ae & plain:
+                # Need to search correct path in the tree: attributes of a leaf not re-encrypted by any descendant
+                # of node (including re-encryption nodes inserted for previous leaves)
+                index = node.tree.index()
                 for child in node.children:
-                    re_enc = node.Ae.intersection(set(authorizations[node.assignee]['plain'])).difference(child.Ap)
-                    for leaf in child.leaves:
-                        path_attr = leaf.Ae.union(leaf.As).intersection(re_enc)
-                        for descendant in node.descendants:
-                            path_attr = path_attr.difference(descendant.Ae)
-                            if not len(path_attr):
-                                break
-                        if len(path_attr):
-                            logging.debug('Inserting a re-encryption node for attribute(s) %s', path_attr)
+                    re_enc = node.Ae & plain & ~child.Ap
+                    for leaf in index.leaves(child):
+                        path_attr = (leaf.Ae | leaf.As) & re_enc & ~index.descendants_Ae(node)
+                        if path_attr:
+                            logging.debug(
+                                'Inserting a re-encryption node for attribute(s) %s', attribute.decode(path_attr))
                             child = Node(
-                                operation='re-encryption', Ap=set(), Ae=path_attr, As=set(), cryptographic=True,
-                                print_label='Re-encrypt ' + str(path_attr), parent=node, children={child})
+                                operation='re-encryption', Ap=0, Ae=path_attr, As=0, cryptographic=True,
+                                print_label='Re-encrypt ' + str(attribute.decode(path_attr)), parent=node,
+                                children={child})
                             child.assignee = node.assignee
                             child.compute_profile()
+                            inserted += 1
         logging.debug('Assignee for %s: %s', node.name, node.assignee)
+    metrics.add(
+        nodes=visited, candidate_evaluations=model.evaluated, pruned_candidates=model.pruned,
+        authorization_checks=authorized.checks, crypto_nodes=inserted)
 
 
-def insert_encryption(authorizations, relations, root, subjects):
+@metrics.timed('insert_encryption')
+def insert_encryption(authorizations, catalog, root, subjects):
     # Recompute profile of leaves after override
-    for node in PostOrderIter(root, filter_=lambda n: n.is_leaf):
+    leaves = post_order(root, filter_=lambda n: n.is_leaf)
+    for node in leaves:
         node.compute_profile()
-    encrypted = set()
+    encrypted = 0
+    visited = len(leaves)
+    inserted = 0
     # Insert and push down encryption
-    for node in PostOrderIter(root, filter_=lambda n: not n.is_leaf and not n.cryptographic):
-        for rel in relations:
-            attr = set(node.ve).union(node.ie)
-            for child in node.children:
-                attr = attr.union(child.ve).union(child.ie)
-            attr = attr.intersection(rel.plain_attr)
-            encrypt = set(authorizations[node.assignee]['enc']).intersection(attr).difference(encrypted)
-            for attr in encrypt:
-                # Insert encryption
-                for leaf in node.leaves:
-                    if attr in leaf.attributes:
-                        new_node = Node(
-                            operation='encryption', Ap=attr,
-                            print_label='Encrypt ' + str(attr), cryptographic=True, parent=leaf.parent,
-                            children={leaf})
-                        new_node.assignee = leaf.assignee
-                        encrypted = encrypted.union(encrypt)
+    for node in iter_post_order(root, filter_=lambda n: not n.is_leaf and not n.cryptographic):
+        visited += 1
+        attr = node.ve | node.ie
+        for child in node.children:
+            attr |= child.ve | child.ie
+        attr &= catalog.plain_mask
+        encrypt = authorizations[node.assignee]['enc'] & attr & ~encrypted
+        index = node.tree.index()
+        for attr in attribute.bits(encrypt):
+            # Insert encryption, leaves are taken again since inserting a node changes their order
+            for leaf in index.leaves(node):
+                if attr & leaf.attributes:
+                    new_node = Node(
+                        operation='encryption', Ap=attr,
+                        print_label='Encrypt ' + attribute.names(attr)[0], cryptographic=True,
+                        parent=leaf.parent, children={leaf})
+                    new_node.assignee = leaf.assignee
+                    encrypted |= encrypt
+                    inserted += 1
+    metrics.add(nodes=visited, crypto_nodes=inserted)
     # Recompute profile of nodes after inserting encryption
-    for node in PostOrderIter(root):
-        node.compute_profile()
+    refresh_profiles(root)
+
 
+# Computes again the profiles of the nodes whose children or whose children profiles changed, in post-order,
+# with the same result of computing the profile of every node
+@metrics.timed('refresh_profiles')
+def refresh_profiles(root: Node):
+    refreshed = 0
+    for node in post_order(root):
+        if node.dirty:
+            node.compute_profile()
+            refreshed += 1
+    metrics.add(nodes=refreshed)
 
+
+@metrics.timed('extend_plan')
 def extend_plan(root: Node, authorizations: dict):
     logging.info('Extending plan with encryption/decryption operations...')
-    for node in PostOrderIter(root):
+    visited = 0
+    inserted = 0
+    for node in iter_post_order(root):
         logging.debug('Extending plan for node %s', node.name)
+        visited += 1
         if node.is_root:
-            decrypt = set()
+            decrypt = 0
             for child in node.children:
-                decrypt = decrypt.union(child.ve, child.vE)
-            if len(decrypt):
-                logging.debug('Inserting a decryption node for attribute(s) %s assigned to U', decrypt)
+                decrypt |= child.ve | child.vE
+            if decrypt:
+                logging.debug(
+                    'Inserting a decryption node for attribute(s) %s assigned to U', attribute.decode(decrypt))
                 new_node = Node(
-                    operation='decryption', Ap=set(), Ae=decrypt, As=set(),
-                    print_label='Decrypt ' + str(decrypt), cryptographic=True, parent=node, children={node.children[0]})
+                    operation='decryption', Ap=0, Ae=decrypt, As=0, print_label='Decrypt ' + str(
+                        attribute.decode(decrypt)), cryptographic=True, parent=node, children={node.children[0]})
                 new_node.assignee = 'U'
+                inserted += 1
         elif len(node.children) and not node.cryptographic:
             for child in node.children:
-                dec = node.Ap.intersection(child.ve.union(child.vE))
-                if len(dec):
-                    logging.debug('Inserting a decryption node for attribute(s) %s', dec)
+                dec = node.Ap & (child.ve | child.vE)
+                if dec:
+                    logging.debug('Inserting a decryption node for attribute(s) %s', attribute.decode(dec))
                     new_node = Node(
-                        operation='decryption', Ap=set(), Ae=dec, As=set(),
-                        print_label='Decrypt ' + str(dec), cryptographic=True, parent=node, children={child})
+                        operation='decryption', Ap=0, Ae=dec, As=0, print_label='Decrypt ' + str(
+                            attribute.decode(dec)), cryptographic=True, parent=node, children={child})
                     new_node.compute_profile()
                     new_node.assignee = node.assignee
+                    inserted += 1
         if not node.is_root and not node.parent.cryptographic:
-            enc = node.vp.intersection(authorizations[node.parent.assignee]['enc'])
-            if len(enc):
+            enc = node.vp & authorizations[node.parent.assignee]['enc']
+            if enc:
                 new_node = Node(
-                    operation='encryption', Ap=enc,
-                    print_label='Encrypt ' + str(enc), cryptographic=True, parent=node.parent, children={node})
+                    operation='encryption', Ap=enc, print_label='Encrypt ' + str(attribute.decode(enc)),
+                    cryptographic=True, parent=node.parent, children={node})
                 new_node.compute_profile()
                 new_node.assignee = node.assignee
+                inserted += 1
+    metrics.add(nodes=visited, crypto_nodes=inserted)
 
 
-def comp_size(root: Node, relations: list):
+# Size of a node is the width of the rows it receives (sum of sizes of visible attributes) or, if numbers of rows of
+# relations are known, the volume of data it receives: the rows of every child by their width (the rows of the
+# relation for leaves), so that costs of computation and transfer follow the volume of data
+@metrics.timed('comp_size')
+def comp_size(root: Node, catalog: Catalog, skip=None):
     logging.info("Computing size of nodes...")
-    for node in PostOrderIter(root):
+    nodes = __prepare_order(root, skip)
+    if catalog.statistics:
+        estimate_rows(nodes, catalog)
+    for node in nodes:
         logging.debug("Computing size of node %s", node.name)
-        vp = set()
-        ve = set()
-        vE = set()
-        if not node.is_leaf:
-            for child in node.children:
-                vp = vp.union(child.vp)
-                ve = ve.union(child.ve)
-                vE = vE.union(child.vE)
+        if node.is_leaf:
+            width = __width(node, catalog)
+            node.size += int(round(node.rows * width)) if node.rows is not None else width
+        elif node.rows is not None:
+            node.size += int(round(sum(child.rows * __width(child, catalog) for child in node.children)))
         else:
-            vp = node.vp
-            ve = node.ve
-            vE = node.vE
-        for relation in relations:
-            for attr in itertools.chain(vp, ve, vE):
-                if attr in relation.attr:
-                    index = relation.attr.index(attr)
-                    node.size += int(relation.size[index])
+            vp = 0
+            ve = 0
+            vE = 0
+            for child in node.children:
+                vp |= child.vp
+                ve |= child.ve
+                vE |= child.vE
+            node.size += catalog.size(vp) + catalog.size(ve) + catalog.size(vE)
+    metrics.add(nodes=len(nodes))
 
 
-def __is_authorized(authorization, node: Node):
-    # Create a list containing current node and its children
-    nodes = list()
-    nodes.append(node)
-    for child in node.children:
-        nodes.append(child)
-    for node in nodes:
-        # Authorized for plaintext
-        if not node.vp.union(node.ip).issubset(set(authorization['plain'])):
-            return False
-        # Authorized for encrypted
-        if not node.ve.union(node.vE, node.ie).issubset(set(authorization['enc']).union(set(authorization['plain']))):
-            return False
-        # Uniform visibility
-        for eq in node.eq:
-            if not eq.issubset(set(authorization['plain'])):
-                if not eq.issubset(set(authorization['enc'])):
-                    return False
-    return True
+# Width of the rows produced by a node: sum of sizes of its visible attributes
+def __width(node: Node, catalog: Catalog):
+    return catalog.size(node.vp) + catalog.size(node.ve) + catalog.size(node.vE)
@@ -1,19 +1,48 @@
+import attribute
+
+
 class Relation:
-    def __init__(self, name, storage_provider, primary_key: list, plain_attr: list,
-                 enc_attr: list, attr: list, enc_costs: str, dec_costs: str, size: str):
+    def __init__(self, name, storage_provider, primary_key: str, plain_attr: str,
+                 enc_attr: str, attr: str, enc_costs: str, dec_costs: str, size: str, rows=None, distinct=None):
         self.name = name
         self.storage_provider = storage_provider
-        if not (primary_key in plain_attr or primary_key in enc_attr):
+        # Attributes are listed as in input files (see attribute.parse)
+        primary_key = attribute.parse(primary_key)
+        plain_attr = attribute.parse(plain_attr)
+        enc_attr = attribute.parse(enc_attr)
+        attr = attribute.parse(attr)
+        if not (all(key in plain_attr for key in primary_key) or all(key in enc_attr for key in primary_key)):
             raise ValueError('Relation: primary key is not valid')
-        self.primary_key = list(primary_key)
+        self.primary_key = primary_key
         enc_costs = enc_costs.split(';')
         dec_costs = dec_costs.split(';')
         size = size.split(';')
         if not (len(attr) == len(enc_costs) == len(dec_costs) == len(size)):
             raise ValueError('Relation: attributes, enc_costs dec_costs and size must have the same length')
-        self.plain_attr = list(plain_attr)
-        self.enc_attr = list(enc_attr)
-        self.attr = list(attr)
-        self.enc_costs = enc_costs
-        self.dec_costs = dec_costs
-        self.size = size
+        self.plain_attr = plain_attr
+        self.enc_attr = enc_attr
+        self.attr = attr
+        # Costs and sizes are parsed once, they are used by every cost evaluation
+        self.enc_costs = [int(cost) for cost in enc_costs]
+        self.dec_costs = [int(cost) for cost in dec_costs]
+        self.size = [int(value) for value in size]
+        # Statistics (optional): number of rows and number of distinct values of attributes
+        self.rows = int(rows) if rows not in (None, '') else None
+        if self.rows is not None and self.rows < 0:
+            raise ValueError('Relation: number of rows must not be negative')
+        self.distinct = dict(distinct) if distinct is not None else dict()
+        # Bitmasks of plain and encrypted attributes, used when computing profiles
+        self.plain_mask = attribute.encode(self.plain_attr)
+        self.enc_mask = attribute.encode(self.enc_attr)
+
+    # Bitmasks depend on the order attributes are interned by a process, they are not pickled
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['plain_mask']
+        del state['enc_mask']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.plain_mask = attribute.encode(self.plain_attr)
+        self.enc_mask = attribute.encode(self.enc_attr)
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import stat
+import traceback
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+import coloredlogs as coloredlogs
+
+import attribute
+import export
+import planner
+from cache import PlanCache
+from catalog import Catalog
+from errors import InputError
+from input import build_tree, read_authorizations, read_base_relations, read_prices
+
+# Maximum size of the body of a request
+MAX_BODY = 16 * 1024 * 1024
+
+# Warm state of a worker process, loaded once when the process starts
+__state = None
+
+
+# Relations, subjects and authorizations kept in memory between requests
+class State:
+    def __init__(self, input_path):
+        logging.info('Loading relations, subjects and authorizations from %s...', input_path)
+        self.input_path = input_path
+        self.relations = dict()
+        # Attributes of the relations: other names in requests are not interned, the universe is kept by the process
+        self.attributes = set()
+        # Relations associated with leaves by relations.csv (position of the node in the tree -> relation)
+        self.leaves = dict()
+        for node_id, relation in read_base_relations(input_path):
+            self.relations[relation.name] = relation
+            self.leaves[node_id] = relation
+            self.attributes.update(relation.attr)
+        self.prices = read_prices(input_path)
+        self.authorizations = read_authorizations(input_path)
+
+    # Builds the input of the algorithm from the rows of a tree. The relation of a leaf is the one named
+    # in its 'relation' field or, if missing, the one associated with its position by relations.csv
+    def inputs(self, rows: list):
+        try:
+            rows = [self.__row(row) for row in rows]
+            for row in rows:
+                for column in 'Ap', 'Ae', 'As', 'group_attr':
+                    unknown = [name for name in attribute.parse(row[column]) if name not in self.attributes]
+                    if unknown:
+                        raise InputError('Unknown attribute %s in node %s' % (unknown[0], row['ID']))
+            nodes, global_Ap = build_tree(rows)
+            relations = list()
+            for node_id, (row, node) in enumerate(zip(rows, nodes), start=1):
+                if not node.is_leaf:
+                    continue
+                if row.get('relation'):
+                    relation = self.relations.get(row['relation'])
+                else:
+                    relation = self.leaves.get(node_id)
+                if relation is None:
+                    raise InputError('No base relation for leaf node %s' % node.name)
+                node.relation = relation
+                relations.append(relation)
+            catalog = Catalog(relations)
+        except (AttributeError, KeyError, IndexError, TypeError, ValueError) as e:
+            raise InputError('Invalid tree: %r' % e) from e
+        return planner.Inputs(nodes[0], catalog, self.prices, self.authorizations, global_Ap)
+
+    # Row of tree.csv from its JSON representation, missing values are empty as in the CSV file
+    @staticmethod
+    def __row(row: dict):
+        row = {key: '' if value is None else value for key, value in row.items()}
+        for column in 'Ap', 'Ae', 'As', 'print_label', 'group_attr':
+            row[column] = str(row.get(column, ''))
+        row['ID'] = int(row['ID'])
+        row['parent'] = int(row.get('parent') or 0)
+        return row
+
+
+def load(input_path):
+    global __state
+    __state = State(input_path)
+
+
+# Computes the plan of a tree in a worker process, returns HTTP status and response
+def plan_tree(request: dict, cache_path=None):
+    try:
+        manual_assignment = manual_subjects(request.get('manual_assignment'))
+        inputs = __state.inputs(request['tree'])
+    except InputError as e:
+        result = planner.PlanResult(errors=[e])
+    else:
+        plan_cache = PlanCache(cache_path) if cache_path is not None else None
+        result = planner.plan(inputs, manual_assignment, plan_cache)
+    if not result.ok:
+        return HTTPStatus.UNPROCESSABLE_ENTITY, {
+            'errors': [{'type': type(error).__name__, 'message': str(error)} for error in result.errors]}
+    return HTTPStatus.OK, {
+        'cost': result.cost,
+        'cached': result.cached,
+        'assignments': [
+            {'node': node.name, 'operation': node.operation, 'assignee': assignee, 'cost': node.cost}
+            for node, assignee in result.assignments],
+        'plan': export.plan_to_dict(result.plan)}
+
+
+# Subjects of a manual assignment given as a string of one-character names ("XYZ") or as a list of names.
+# The number of subjects and their names are checked by the planner against the tree.
+def manual_subjects(manual_assignment):
+    if manual_assignment is None:
+        return None
+    if isinstance(manual_assignment, str):
+        return list(manual_assignment)
+    if isinstance(manual_assignment, list) and all(isinstance(subject, str) for subject in manual_assignment):
+        return manual_assignment
+    raise InputError('manual_assignment must be a string or a list of subjects, not %s' % json.dumps(manual_assignment))
+
+
+# Planning server: requests are served by an asyncio event loop over HTTP/1.1, plans are computed by a pool of
+# worker processes, each keeping relations, subjects and authorizations in memory
+class Server:
+    def __init__(self, input_path, workers=None, cache_path=None):
+        self.input_path = input_path
+        self.workers = workers
+        self.cache_path = cache_path
+        # Errors in input files are reported before serving requests
+        self.state = State(input_path)
+        self.pool = self.__pool()
+
+    # Workers are started by the pool when plans are requested, while connections of clients are open: they are
+    # spawned as new processes, which do not inherit the sockets of the server (a forked worker would keep the
+    # connection of a client open after the server closes it)
+    def __pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=load,
+            initargs=(self.input_path,))
+
+    async def serve(self, socket_path=None, host='127.0.0.1', port=8080):
+        if socket_path is not None:
+            # Socket left by a previous server
+            if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+            logging.info('Serving on %s', socket_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            logging.info('Serving on %s:%d', host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(wait=False)
+
+    # Serves the requests of a connection, which is kept open unless the client asks to close it
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = False
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    headers = dict()
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length', 0))
+                    if length < 0:
+                        raise ValueError('negative content length')
+                except ValueError:
+                    status, response = HTTPStatus.BAD_REQUEST, {'errors': [{'message': 'Malformed request'}]}
+                else:
+                    if length > MAX_BODY:
+                        status, response = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {
+                            'errors': [{'message': 'Request body larger than %d bytes' % MAX_BODY}]}
+                    else:
+                        body = await reader.readexactly(length) if length else b''
+                        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                        status, response = await self.dispatch(method, target, body)
+                self.__respond(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def __respond(writer: asyncio.StreamWriter, status: HTTPStatus, response: dict, keep_alive: bool):
+        body = json.dumps(response).encode()
+        head = 'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n' % (
+            status.value, status.phrase, len(body))
+        if not keep_alive:
+            head += 'Connection: close\r\n'
+        writer.write(head.encode('latin-1') + b'\r\n' + body)
+
+    async def dispatch(self, method, target, body: bytes):
+        logging.debug('%s %s', method, target)
+        if target == '/plan' and method == 'POST':
+            return await self.plan(body)
+        if target == '/reload' and method == 'POST':
+            return await self.reload()
+        if target == '/health' and method == 'GET':
+            return HTTPStatus.OK, {
+                'status': 'ok', 'relations': sorted(self.state.relations), 'subjects': list(self.state.prices)}
+        if target in ('/plan', '/reload', '/health'):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'errors': [{'message': 'Method %s not allowed' % method}]}
+        return HTTPStatus.NOT_FOUND, {'errors': [{'message': 'Unknown resource %s' % target}]}
+
+    # Plans a tree given as {"tree": [rows of tree.csv], "manual_assignment": "XYZ"}
+    async def plan(self, body: bytes):
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {'errors': [{'message': 'Invalid JSON: %s' % e}]}
+        if not isinstance(request, dict) or not isinstance(request.get('tree'), list) or not request['tree']:
+            return HTTPStatus.BAD_REQUEST, {'errors': [{'message': 'Request must contain a non empty tree'}]}
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.pool, plan_tree, request, self.cache_path)
+        except Exception as e:
+            logging.error('Planning failed: %s', traceback.format_exc())
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'errors': [{'type': type(e).__name__, 'message': repr(e)}]}
+
+    # Reads input files again, plans requested afterwards use the new relations, subjects and authorizations
+    async def reload(self):
+        loop = asyncio.get_running_loop()
+        try:
+            state = await loop.run_in_executor(None, State, self.input_path)
+        except (OSError, ValueError, KeyError) as e:
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {'errors': [{'type': type(e).__name__, 'message': repr(e)}]}
+        old_pool, self.pool = self.pool, self.__pool()
+        self.state = state
+        # Plans already submitted are completed by the old workers
+        old_pool.shutdown(wait=False)
+        return HTTPStatus.OK, {'status': 'reloaded'}
+
+
+def serve(args):
+    coloredlogs.install(
+        level=args.loglevel, fmt='%(asctime)s [%(funcName)s] %(levelname)s %(message)s', datefmt='%H:%M:%S')
+    try:
+        server = Server(args.input, args.workers, args.cache)
+    except (OSError, ValueError, KeyError) as e:
+        print('Cannot read input from %s: %r' % (args.input, e))
+        return 1
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        logging.info('Server stopped')
+    return 0
+
+
+def parse_args():
+    parser = ArgumentParser(description='Serve plans of query trees over HTTP')
+    parser.add_argument(
+        "-i", "--input", metavar='INPUT', dest="input", required=True,
+        help="Path from where read relations, subjects and authorizations")
+    parser.add_argument(
+        "-s", "--socket", metavar='SOCKET', dest="socket", help="Unix socket where to listen for requests")
+    parser.add_argument(
+        "--host", metavar='HOST', dest="host", default='127.0.0.1', help="Address where to listen for requests")
+    parser.add_argument(
+        "--port", type=int, metavar='PORT', dest="port", default=8080, help="Port where to listen for requests")
+    parser.add_argument(
+        "-w", "--workers", type=int, metavar='N', dest="workers", help="Number of worker processes")
+    parser.add_argument(
+        "-c", "--cache", metavar='CACHE', dest="cache", help="Directory of the persistent cache of computed plans")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '-v', '--verbose', help="Be verbose", action="store_const",
+        dest="loglevel", const=logging.INFO, default=logging.WARNING)
+    group.add_argument(
+        '-d', '--debug', help="Print lots of debugging statements",
+        action="store_const", dest="loglevel", const=logging.DEBUG)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    exit(serve(parse_args()))
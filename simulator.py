@@ -0,0 +1,368 @@
+import json
+import logging
+import time
+from argparse import ArgumentParser
+
+import coloredlogs as coloredlogs
+import numpy as np
+
+import attribute
+from cardinality import selection_selectivity
+from catalog import Catalog
+from errors import InputError
+from node import Node
+from planner import Inputs, plan
+from tree import post_order
+
+# Rows of relations without statistics
+DEFAULT_ROWS = 1000
+
+
+# Stand-in for a deterministic cipher over 64 bit values: equal values have equal ciphertexts, so that joins and
+# groups can be evaluated on encrypted attributes. Every round multiplies, adds a key and rotates the values.
+class Cipher:
+    MULTIPLIER = 0x9E3779B97F4A7C15
+
+    def __init__(self, seed=0, rounds=8):
+        self.keys = [np.uint64(key) for key in np.random.default_rng(seed).integers(0, 2 ** 63, rounds)]
+        self.multiplier = np.uint64(Cipher.MULTIPLIER)
+        self.inverse = np.uint64(pow(Cipher.MULTIPLIER, -1, 2 ** 64))
+
+    def encrypt(self, values):
+        values = values.copy()
+        for key in self.keys:
+            values *= self.multiplier
+            values += key
+            values = (values << np.uint64(29)) | (values >> np.uint64(35))
+        return values
+
+    def decrypt(self, values):
+        values = values.copy()
+        for key in reversed(self.keys):
+            values = (values >> np.uint64(29)) | (values << np.uint64(35))
+            values -= key
+            values *= self.inverse
+        return values
+
+
+# Columnar batch of rows: values of attributes (by name) and the attributes whose values are encrypted
+class Batch:
+    def __init__(self, columns: dict, encrypted: set):
+        self.columns = columns
+        self.encrypted = encrypted
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def take(self, rows):
+        return Batch({attr: values[rows] for attr, values in self.columns.items()}, set(self.encrypted))
+
+    def project(self, attrs):
+        return Batch(
+            {attr: values for attr, values in self.columns.items() if attr in attrs},
+            {attr for attr in self.encrypted if attr in attrs})
+
+    # Bytes of the batch, values of an attribute have the size given by the catalog
+    def size(self, catalog: Catalog):
+        return sum(len(values) * width(attr, catalog) for attr, values in self.columns.items())
+
+
+def width(attr, catalog: Catalog):
+    entry = catalog.entries.get(1 << attribute.intern(attr))
+    return entry.size if entry is not None else 8
+
+
+# Batches of a table split in batches of batch_size rows
+def split(batch: Batch, batch_size: int):
+    return [batch.take(slice(start, start + batch_size)) for start in range(0, max(len(batch), 1), batch_size)]
+
+
+# Single batch with all the rows of batches
+def concatenate(batches: list):
+    batches = [batch for batch in batches if batch.columns]
+    if not batches:
+        return Batch(dict(), set())
+    columns = {attr: np.concatenate([batch.columns[attr] for batch in batches]) for attr in batches[0].columns}
+    return Batch(columns, set(batches[0].encrypted))
+
+
+# Synthetic tables of base relations: values of every attribute are uniform over its distinct values (the primary
+# key is unique), attributes stored encrypted are encrypted by the cipher
+def generate_tables(catalog: Catalog, cipher: Cipher, rows=None, seed=0):
+    rng = np.random.default_rng(seed)
+    tables = dict()
+    for relation in catalog.relations:
+        count = rows if rows is not None else relation.rows if relation.rows is not None else DEFAULT_ROWS
+        columns = dict()
+        for attr in relation.attr:
+            if relation.primary_key == [attr]:
+                values = rng.permutation(count).astype(np.uint64)
+            else:
+                distinct = relation.distinct.get(attr) or max(1, count // 10)
+                values = rng.integers(0, distinct, count).astype(np.uint64)
+            columns[attr] = cipher.encrypt(values) if attr in relation.enc_attr else values
+        tables[relation.name] = Batch(columns, set(relation.enc_attr))
+        logging.debug('Generated %d rows of relation %s', count, relation.name)
+    return tables
+
+
+# Executes the operations of a final plan (as returned by planner.plan) over tables of base relations, every node
+# by its assignee. Results of nodes are lists of columnar batches: unary operations process one batch at a time,
+# joins and group-by their whole inputs. Results are shipped from the assignee of a node to the assignee of its
+# parent, measuring bytes moved between subjects and CPU time spent by every subject. Joins producing more than
+# max_rows rows are not executed, plans producing no rows are errors.
+class Simulator:
+    def __init__(self, catalog: Catalog, tables: dict, cipher: Cipher, batch_size=65536, max_rows=10 ** 7):
+        self.catalog = catalog
+        self.tables = tables
+        self.cipher = cipher
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        # (sender, receiver) -> bytes and subject -> CPU seconds
+        self.transfers = dict()
+        self.cpu = dict()
+        self.nodes = list()
+
+    def run(self, root: Node):
+        results = dict()
+        for node in post_order(root):
+            inputs = list()
+            for child in node.children:
+                batches = results.pop(child)
+                if child.assignee != node.assignee:
+                    sent = sum(batch.size(self.catalog) for batch in batches)
+                    key = child.assignee, node.assignee
+                    self.transfers[key] = self.transfers.get(key, 0) + sent
+                inputs.append(batches)
+            start = time.process_time()
+            batches = self.__execute(node, inputs)
+            seconds = time.process_time() - start
+            self.cpu[node.assignee] = self.cpu.get(node.assignee, 0) + seconds
+            self.nodes.append({
+                'node': node.name, 'operation': node.operation, 'assignee': node.assignee,
+                'estimated_cost': node.cost, 'seconds': seconds, 'rows': sum(len(batch) for batch in batches),
+                'bytes': sum(batch.size(self.catalog) for batch in batches)})
+            results[node] = batches
+        output = concatenate(results[root])
+        # Measures of a plan over no rows do not tell anything about its costs
+        if not len(output):
+            raise ValueError('Simulator: the plan produced no rows, tables may be too small')
+        return output
+
+    def __execute(self, node: Node, inputs: list):
+        visible = set(attribute.names(node.vp | node.ve | node.vE))
+        if node.operation == 'query':
+            return inputs[0]
+        if node.is_leaf:
+            table = self.tables[node.relation.name]
+            return [batch.project(visible) for batch in split(table, self.batch_size)]
+        if node.operation in ('encryption', 'decryption', 're-encryption'):
+            # Attributes to encrypt are in Ap, attributes to decrypt or re-encrypt in Ae
+            attrs = attribute.names(node.Ap if node.operation == 'encryption' else node.Ae)
+            return [self.__crypto(node.operation, batch, attrs) for batch in inputs[0]]
+        if node.operation == 'selection':
+            selectivity = node.selectivity
+            if selectivity is None:
+                selectivity = selection_selectivity(node, self.catalog)
+            attrs = attribute.names(node.attributes)
+            return [self.__select(batch, attrs, selectivity).project(visible) for batch in inputs[0]]
+        if node.operation in ('join', 'cartesian'):
+            table = concatenate(inputs[0])
+            for batches in inputs[1:]:
+                table = self.__join(
+                    table, concatenate(batches), attribute.names(node.attributes) if node.operation == 'join' else [],
+                    self.max_rows)
+            return split(table.project(visible), self.batch_size)
+        if node.operation == 'group-by':
+            table = self.__group(concatenate(inputs[0]), attribute.names(node.group_attr))
+            return split(table.project(visible), self.batch_size)
+        # Projection
+        return [batch.project(visible) for batch in inputs[0]]
+
+    def __crypto(self, operation, batch: Batch, attrs: list):
+        columns = dict(batch.columns)
+        encrypted = set(batch.encrypted)
+        for attr in attrs:
+            if attr not in columns:
+                continue
+            if operation != 'encryption' and attr in encrypted:
+                columns[attr] = self.cipher.decrypt(columns[attr])
+                encrypted.discard(attr)
+            if operation != 'decryption' and attr not in encrypted:
+                columns[attr] = self.cipher.encrypt(columns[attr])
+                encrypted.add(attr)
+        return Batch(columns, encrypted)
+
+    # Keeps a fraction of rows given by the selectivity, chosen by the values of the attributes of the condition
+    @staticmethod
+    def __select(batch: Batch, attrs: list, selectivity: float):
+        attrs = [attr for attr in attrs if attr in batch.columns]
+        if not attrs or not len(batch):
+            return batch
+        values = np.zeros(len(batch), dtype=np.uint64)
+        for attr in attrs:
+            values = values * np.uint64(Cipher.MULTIPLIER) + batch.columns[attr]
+        values = (values * np.uint64(Cipher.MULTIPLIER)) >> np.uint64(44)
+        return batch.take(values < np.uint64(selectivity * 2 ** 20))
+
+    # Equi-join on the equality conditions of attrs (cartesian product without them). Values of an attribute
+    # stored encrypted on one side are compared with the encrypted values of the other side.
+    def __join(self, left: Batch, right: Batch, attrs: list, max_rows: int):
+        pairs = self.__pairs(left, right, attrs)
+        if pairs:
+            left_keys = [left.columns[attr] for attr, _ in pairs]
+            right_keys = [right.columns[attr] for _, attr in pairs]
+            for index, (left_attr, right_attr) in enumerate(pairs):
+                if left_attr in left.encrypted and right_attr not in right.encrypted:
+                    right_keys[index] = self.cipher.encrypt(right_keys[index])
+                elif left_attr not in left.encrypted and right_attr in right.encrypted:
+                    left_keys[index] = self.cipher.encrypt(left_keys[index])
+            # Rows of both inputs are numbered by their values of the join attributes
+            _, codes = np.unique(
+                np.concatenate([np.stack(left_keys, axis=1), np.stack(right_keys, axis=1)]), axis=0,
+                return_inverse=True)
+            codes = codes.reshape(-1)
+            keys, right_codes = codes[:len(left)], codes[len(left):]
+            order = np.argsort(right_codes, kind='stable')
+            sorted_keys = right_codes[order]
+            low = np.searchsorted(sorted_keys, keys, 'left')
+            counts = np.searchsorted(sorted_keys, keys, 'right') - low
+        else:
+            order = np.arange(len(right))
+            low = np.zeros(len(left), dtype=np.int64)
+            counts = np.full(len(left), len(right))
+        if counts.sum() > max_rows:
+            raise ValueError('Simulator: join of %d rows exceeds %d rows' % (counts.sum(), max_rows))
+        left_rows = np.repeat(np.arange(len(left)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        right_rows = order[np.repeat(low, counts) + offsets]
+        columns = {attr: values[left_rows] for attr, values in left.columns.items()}
+        columns.update({attr: values[right_rows] for attr, values in right.columns.items()})
+        if pairs and not len(left_rows) and len(left) and len(right):
+            raise ValueError('Simulator: join on %s produced no rows, tables may be too small' % ', '.join(
+                '%s=%s' % pair for pair in pairs))
+        return Batch(columns, left.encrypted | right.encrypted)
+
+    # Equality conditions of a join as pairs of attributes of left and right: an attribute of the condition found
+    # in both inputs is compared with itself, the other ones of left with the other ones of right, in order
+    @staticmethod
+    def __pairs(left: Batch, right: Batch, attrs: list):
+        pairs = [(attr, attr) for attr in attrs if attr in left.columns and attr in right.columns]
+        left_attrs = [attr for attr in attrs if attr in left.columns and attr not in right.columns]
+        right_attrs = [attr for attr in attrs if attr in right.columns and attr not in left.columns]
+        if len(left_attrs) != len(right_attrs):
+            raise ValueError('Simulator: cannot pair attributes %s and %s of a join' % (
+                attribute.label(left_attrs), attribute.label(right_attrs)))
+        return pairs + list(zip(left_attrs, right_attrs))
+
+    # One row for every group of values of the grouping attributes, other attributes are summed (with wrap around)
+    @staticmethod
+    def __group(batch: Batch, attrs: list):
+        attrs = [attr for attr in attrs if attr in batch.columns]
+        if not attrs or not len(batch):
+            return batch
+        keys = np.stack([batch.columns[attr] for attr in attrs], axis=1)
+        _, first, groups = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        groups = groups.reshape(-1)
+        order = np.argsort(groups, kind='stable')
+        starts = np.searchsorted(groups[order], np.arange(len(first)))
+        columns = dict()
+        for attr, values in batch.columns.items():
+            if attr in attrs:
+                columns[attr] = values[first]
+            else:
+                columns[attr] = np.add.reduceat(values[order], starts)
+        return Batch(columns, set(batch.encrypted))
+
+    # Measured bytes and CPU time by subject, transfers between subjects and measures of every node
+    def report(self):
+        subjects = sorted(set(self.cpu) | {subject for key in self.transfers for subject in key})
+        report = {'subjects': dict(), 'transfers': list(), 'nodes': self.nodes}
+        for subject in subjects:
+            report['subjects'][subject] = {
+                'cpu_seconds': self.cpu.get(subject, 0),
+                'bytes_sent': sum(sent for (sender, _), sent in self.transfers.items() if sender == subject),
+                'bytes_received': sum(sent for (_, receiver), sent in self.transfers.items() if receiver == subject)}
+        for (sender, receiver), sent in sorted(self.transfers.items()):
+            report['transfers'].append({'from': sender, 'to': receiver, 'bytes': sent})
+        # Agreement of the estimated costs of the work of nodes (see CostModel.own_cost) with their measured CPU time,
+        # nodes inserted by the planner for cryptographic operations have no estimate
+        measured = [
+            (node['estimated_cost'], node['seconds']) for node in self.nodes if node['estimated_cost'] is not None]
+        report['estimated_cost'] = sum(cost for cost, _ in measured)
+        report['correlation'] = None
+        if len(measured) > 2:
+            correlation = np.corrcoef(np.array(measured, dtype=np.float64).T)[0, 1]
+            report['correlation'] = None if np.isnan(correlation) else float(correlation)
+        return report
+
+
+def simulate(args):
+    coloredlogs.install(
+        level=args.loglevel, fmt='%(asctime)s [%(funcName)s] %(levelname)s %(message)s', datefmt='%H:%M:%S')
+    try:
+        inputs = Inputs.read(args.input)
+    except InputError as e:
+        print(e)
+        return 1
+    catalog = inputs.catalog
+    result = plan(inputs, assignment=args.assignment)
+    if not result.ok:
+        for error in result.errors:
+            print(error)
+        return 1
+    cipher = Cipher(args.seed)
+    simulator = Simulator(
+        catalog, generate_tables(catalog, cipher, args.rows, args.seed), cipher, args.batch_size, args.max_rows)
+    try:
+        output = simulator.run(result.plan)
+    except ValueError as e:
+        print(e)
+        return 1
+    report = simulator.report()
+    report['rows'] = len(output)
+    for subject, measures in report['subjects'].items():
+        print('%-8s cpu %9.4fs  sent %12d B  received %12d B' % (
+            subject, measures['cpu_seconds'], measures['bytes_sent'], measures['bytes_received']))
+    for node in report['nodes']:
+        print('%-8s %10.4fs %10d rows %12d B  estimated %10s  %s' % (
+            node['assignee'], node['seconds'], node['rows'], node['bytes'], node['estimated_cost'], node['node']))
+    print('Result: %d rows, estimated cost %s, correlation of estimated costs and CPU time of nodes: %s' % (
+        report['rows'], report['estimated_cost'],
+        '%.3f' % report['correlation'] if report['correlation'] is not None else '-'))
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+def parse_args():
+    parser = ArgumentParser(description='Execute the plan of an input over synthetic data, measuring its costs')
+    parser.add_argument(
+        "-i", "--input", metavar='INPUT', dest="input", help="Path from where read input", required=True)
+    parser.add_argument(
+        "-a", "--assignment", choices=['greedy', 'optimal'], default='greedy', dest="assignment",
+        help="Assignment of nodes: greedy visit of the tree or minimum total cost")
+    parser.add_argument(
+        "--rows", type=int, metavar='N', dest="rows",
+        help="Rows of every relation (default: rows of relations, or %d if unknown)" % DEFAULT_ROWS)
+    parser.add_argument(
+        "--batch-size", type=int, default=65536, metavar='N', dest="batch_size", help="Rows of columnar batches")
+    parser.add_argument(
+        "--max-rows", type=int, default=10 ** 7, metavar='N', dest="max_rows",
+        help="Maximum rows produced by a join (default: 10000000)")
+    parser.add_argument("--seed", type=int, default=0, dest="seed", help="Seed of synthetic data and keys")
+    parser.add_argument(
+        "-o", "--output", metavar='OUTPUT', dest="output", help="JSON file where to save measures")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '-v', '--verbose', help="Be verbose", action="store_const",
+        dest="loglevel", const=logging.INFO, default=logging.WARNING)
+    group.add_argument(
+        '-d', '--debug', help="Print lots of debugging statements",
+        action="store_const", dest="loglevel", const=logging.DEBUG)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    exit(simulate(parse_args()))
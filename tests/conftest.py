@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Modules of the algorithm are at the top of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from workload import Workload
+
+
+# Writes random workloads in a temporary directory, returns the path of the input directory
+@pytest.fixture
+def workload(tmp_path):
+    def write(seed, **parameters):
+        path = os.path.join(str(tmp_path), 'workload_%d' % seed, '')
+        Workload(seed=seed, **parameters).write(path)
+        return path
+    return write
@@ -0,0 +1,53 @@
+import pytest
+
+import procedures as p
+from authorization import AuthorizationCache, is_authorized, requirements
+from parallel import ParallelChecker
+from planner import Inputs, Planner
+from tree import pre_order
+
+
+def prepare(path, **options):
+    inputs = Inputs.read(path)
+    return Planner(inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, inputs.global_Ap, **options)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_index(workload, seed):
+    planner = prepare(workload(seed, attributes=40, relations=4, subjects=40))
+    subjects = list(planner.authorizations.items())
+    authorized = AuthorizationCache()
+    # Classes are indexed in two batches, as when subjects are added to a planner
+    authorized.classify(dict(subjects[:len(subjects) // 2]))
+    authorized.classify(dict(subjects))
+    for node in pre_order(planner.root):
+        required = requirements(node)
+        expected = sum(
+            1 << i for i, (plain, enc) in enumerate(authorized.authorizations) if is_authorized(plain, enc, required))
+        assert authorized.authorized_classes(required) == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_candidates_are_authorized(workload, seed):
+    planner = prepare(workload(seed, attributes=40, relations=4, subjects=40))
+    for node in pre_order(planner.root, filter_=lambda n: not n.is_leaf):
+        required = requirements(node)
+        assert len(set(node.candidates)) == len(node.candidates)
+        for subject in node.candidates:
+            authorization = planner.authorizations[subject]
+            assert is_authorized(authorization['plain'], authorization['enc'], required)
+
+
+def test_parallel_candidates(workload):
+    path = workload(0, attributes=40, relations=4, subjects=200)
+    expected = [node.candidates for node in pre_order(prepare(path).root)]
+    parallel = ParallelChecker(workers=2, chunk_size=16, min_work=1)
+    try:
+        planner = prepare(path, parallel=parallel)
+        assert parallel.pool is not None
+        assert [node.candidates for node in pre_order(planner.root)] == expected
+        # The pool is kept by its owner for later selections
+        p.select_candidates(planner.root, planner.subjects, planner.authorizations, planner.authorized, parallel)
+        assert [node.candidates for node in pre_order(planner.root)] == expected
+    finally:
+        parallel.shutdown()
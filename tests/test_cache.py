@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from cache import PlanCache, fingerprint
+from planner import Inputs, plan
+from tree import pre_order
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def example(name):
+    return Inputs.read(os.path.join(ROOT, 'Examples', name, ''))
+
+
+def key(inputs, **options):
+    return fingerprint(inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, **options)
+
+
+def test_fingerprint():
+    assert key(example('Paper')) == key(example('Paper'))
+    assert key(example('Paper')) != key(example('Join1'))
+    assert key(example('Paper')) != key(example('Paper'), assignment='optimal')
+    inputs = example('Paper')
+    inputs.prices = dict(inputs.prices, U={'comp_price': 2, 'transfer_price': 1})
+    assert key(inputs) != key(example('Paper'))
+
+
+def test_hit_and_miss(tmp_path):
+    cache = PlanCache(str(tmp_path))
+    missed = plan(example('Paper'), plan_cache=cache)
+    assert missed.ok and not missed.cached
+    hit = plan(example('Paper'), plan_cache=cache)
+    assert hit.ok and hit.cached
+    assert [(node.operation, node.assignee, node.cost) for node in pre_order(hit.plan)] == \
+        [(node.operation, node.assignee, node.cost) for node in pre_order(missed.plan)]
+    assert hit.cost == missed.cost == 1356
+    # Another input and another assignment are not in the cache
+    assert not plan(example('Join1'), plan_cache=cache).cached
+    assert not plan(example('Paper'), plan_cache=cache, assignment='optimal').cached
+
+
+# Contents not unpickled and a pickle of a class that does not exist
+@pytest.mark.parametrize('content', [b'not a plan', b'cmissing_module\nPlan\n.'])
+def test_corrupted_entry(tmp_path, content):
+    cache = PlanCache(str(tmp_path))
+    with open(os.path.join(str(tmp_path), 'entry.pickle'), 'wb') as file:
+        file.write(content)
+    assert cache.get('entry') is None
+    assert not os.path.exists(os.path.join(str(tmp_path), 'entry.pickle'))
+
+
+def test_eviction(tmp_path):
+    cache = PlanCache(str(tmp_path), max_entries=2)
+    names = ['Paper', 'Join1', 'Group1']
+    keys = {name: key(example(name)) for name in names}
+    for time, name in enumerate(names[:2]):
+        plan(example(name), plan_cache=cache)
+        # Entries are ordered by time of last use
+        os.utime(os.path.join(str(tmp_path), keys[name] + '.pickle'), (time, time))
+    # Using Paper makes Join1 the least recently used entry
+    assert cache.get(keys['Paper']) is not None
+    plan(example('Group1'), plan_cache=cache)
+    assert sorted(os.listdir(str(tmp_path))) == sorted(
+        keys[name] + '.pickle' for name in ('Paper', 'Group1'))
+    assert cache.get(keys['Join1']) is None
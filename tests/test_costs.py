@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+import attribute
+from costs import CostModel
+from planner import Inputs, Planner
+from tree import pre_order
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_cheapest(workload, seed):
+    inputs = Inputs.read(workload(seed, attributes=20, relations=3, subjects=30))
+    planner = Planner(inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, inputs.global_Ap)
+    # Small scans, so that candidates are pruned by their lower bounds
+    model = CostModel(
+        planner.subjects, planner.authorizations, planner.catalog, planner.avg_comp_price,
+        planner.avg_transfer_price, block_size=4, scan_size=2)
+    nodes = pre_order(planner.root, filter_=lambda n: not n.is_leaf and not n.cryptographic)
+    model.schedule(nodes)
+    generator = random.Random(seed)
+    for node in nodes:
+        node.parent.assignee = generator.choice(list(planner.subjects))
+        to_enc_dec = sum(bit for bit in attribute.bits(planner.catalog.enc_mask) if generator.random() < 0.5)
+        costs = model.row(node, to_enc_dec).tolist()
+        # Minimum cost, ties broken by the order of candidates
+        assert model.cheapest(node, to_enc_dec) == (node.candidates[costs.index(min(costs))], min(costs))
+        assert model.cost(node, to_enc_dec, node.candidates[-1]) == costs[-1]
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from planner import plan
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Total cost (sum of the own costs of nodes) and assignees (in pre-order of the final plan) of the examples, assigned
+# as by the original algorithm
+EXPECTED = {
+    'All': (21771, 'UUTUUULLACCLQFFF'),
+    'Cartesian1': (88, 'UUFC'),
+    'Cartesian2': (374, 'UULLFC'),
+    'Group1': (34018, 'UNNOOF'),
+    'Group2': (576, 'UUROOF'),
+    'Join1': (196, 'UNFC'),
+    'Join2': (582, 'UURRRCARF'),
+    'Join3': (1152, 'UUPPCAPPPKPF'),
+    'Paper': (1356, 'UUYYYYYZCXUF'),
+    'Projection1': (178, 'UNNNF'),
+    'Select1': (322, 'UPPPFPC'),
+    'Thesis': (692, 'UUXXXXYBYA'),
+}
+
+# Total cost and assignees of the examples whose optimal assignment differs from the one of the greedy visit
+OPTIMAL = {
+    'All': (14605, 'UUUUUULLCALRFF'),
+    'Group2': (528, 'UURRRF'),
+    'Projection1': (162, 'UPPPF'),
+}
+
+
+@pytest.mark.parametrize('example', sorted(EXPECTED))
+@pytest.mark.parametrize('assignment', ['greedy', 'optimal'])
+def test_example(example, assignment):
+    result = plan(os.path.join(ROOT, 'Examples', example, ''), assignment=assignment)
+    assert result.ok
+    expected = OPTIMAL.get(example, EXPECTED[example]) if assignment == 'optimal' else EXPECTED[example]
+    assert (result.cost, ''.join(assignee for _, assignee in result.assignments)) == expected
+
+
+def test_csv_data():
+    result = plan(os.path.join(ROOT, 'CSV_data', ''))
+    assert result.ok
+    assert (result.cost, ''.join(assignee for _, assignee in result.assignments)) == (170, 'UUUUUUUUFUUC')
+
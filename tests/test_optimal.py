@@ -0,0 +1,56 @@
+import copy
+import itertools
+
+import pytest
+
+import procedures as p
+from costs import CostModel
+from optimal import optimal_assignment
+from planner import Inputs, Planner
+from tree import pre_order
+
+SEEDS = range(20)
+
+
+def prepare(path):
+    inputs = Inputs.read(path)
+    return Planner(inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, inputs.global_Ap)
+
+
+def scheduled(root):
+    return [node for node in pre_order(root) if not node.is_leaf and not node.cryptographic]
+
+
+# Sum of the costs of the work of the nodes of planner for their assignees, given in pre-order, including transfers
+# between them and excluding re-encryptions of attributes pushed down by ancestors
+def objective(planner: Planner, assignees):
+    model = CostModel(
+        planner.subjects, planner.authorizations, planner.catalog, planner.avg_comp_price, planner.avg_transfer_price)
+    nodes = scheduled(planner.root)
+    for node, assignee in zip(nodes, assignees):
+        node.assignee = assignee
+    return sum(model.own_cost(node, 0, node.assignee) for node in nodes)
+
+
+# Assignees chosen by the greedy visit of compute_assignment, in pre-order
+def greedy(planner: Planner):
+    memo = {id(relation): relation for relation in planner.catalog.relations}
+    root = copy.deepcopy(planner.root.root, memo).children[0]
+    p.compute_assignment(
+        root, planner.subjects, planner.authorizations, planner.catalog, planner.avg_comp_price,
+        planner.avg_transfer_price)
+    return [node.assignee for node in scheduled(root)]
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_optimal_is_minimum(workload, seed):
+    planner = prepare(workload(seed, depth=1, attributes=6, relations=2, subjects=3))
+    assignees = optimal_assignment(
+        planner.root, planner.subjects, planner.authorizations, planner.catalog, planner.avg_comp_price,
+        planner.avg_transfer_price)
+    nodes = scheduled(planner.root)
+    optimal = objective(planner, [assignees[node] for node in nodes])
+    # Every assignment of candidates to the scheduled nodes
+    costs = [objective(planner, choice) for choice in itertools.product(*[node.candidates for node in nodes])]
+    assert optimal == pytest.approx(min(costs))
+    assert optimal <= objective(planner, greedy(planner)) + 1e-6
@@ -0,0 +1,118 @@
+import csv
+import os
+import random
+import shutil
+
+import pytest
+
+import attribute
+from errors import InputError, PlanningError
+from planner import Inputs, Planner, plan
+from tree import pre_order
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Operations, assignees and costs of the nodes of a final plan, in pre-order
+def summary(root):
+    return [(node.operation, node.assignee, node.cost) for node in pre_order(root)]
+
+
+# Plan of the input in path computed from scratch, with the given prices and authorizations (as strings)
+def full_plan(path, prices, authorizations):
+    inputs = Inputs.read(path)
+    authorizations = {
+        subject: {'plain': attribute.encode(plain), 'enc': attribute.encode(enc)}
+        for subject, (plain, enc) in authorizations.items()}
+    try:
+        return summary(Planner(inputs.root, inputs.catalog, prices, authorizations, inputs.global_Ap).plan())
+    except PlanningError as e:
+        return type(e)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_incremental_changes(workload, seed):
+    path = workload(seed, depth=1, attributes=10, relations=3, subjects=6)
+    inputs = Inputs.read(path)
+    planner = Planner(inputs.root, inputs.catalog, inputs.prices, inputs.authorizations, inputs.global_Ap)
+    planner.plan()
+    prices = dict(inputs.prices)
+    authorizations = {
+        subject: (''.join(attribute.names(authorization['plain'])), ''.join(attribute.names(authorization['enc'])))
+        for subject, authorization in inputs.authorizations.items()}
+    names = sorted(attribute.names(inputs.catalog.plain_mask | inputs.catalog.enc_mask))
+    providers = {relation.storage_provider for relation in inputs.catalog.relations}
+    generator = random.Random(seed)
+    for step in range(8):
+        subject = generator.choice(sorted(set(prices) - providers - {'U'}))
+        plain = ''.join(name for name in names if generator.random() < 0.4)
+        enc = ''.join(name for name in names if name not in plain and generator.random() < 0.5)
+        price = {'comp_price': generator.randint(1, 9), 'transfer_price': generator.randint(1, 9)}
+        change = generator.choice(['add', 'remove', 'prices', 'authorization'])
+        if change == 'add':
+            subject = 'N%d' % step
+            prices[subject], authorizations[subject] = price, (plain, enc)
+            update = (planner.add_subject, subject, price['comp_price'], price['transfer_price'], plain, enc)
+        elif change == 'remove':
+            del prices[subject], authorizations[subject]
+            update = (planner.remove_subject, subject)
+        elif change == 'prices':
+            prices[subject] = price
+            update = (planner.set_prices, subject, price['comp_price'], price['transfer_price'])
+        else:
+            authorizations[subject] = plain, enc
+            update = (planner.set_authorization, subject, plain, enc)
+        expected = full_plan(path, prices, authorizations)
+        try:
+            result = summary(update[0](*update[1:]))
+        except PlanningError as e:
+            result = type(e)
+        assert result == expected
+        if not isinstance(expected, list):
+            break
+
+
+@pytest.mark.parametrize('manual_assignment', ['YYY', 'YYYYY', 'YYYQ', 5])
+def test_invalid_manual_assignment(manual_assignment):
+    result = plan(os.path.join(ROOT, 'Examples', 'Paper', ''), manual_assignment)
+    assert not result.ok
+    assert [type(error) for error in result.errors] == [InputError]
+
+
+def test_manual_assignment():
+    path = os.path.join(ROOT, 'Examples', 'Paper', '')
+    greedy = plan(path)
+    manual = plan(path, [
+        assignee for node, assignee in greedy.assignments
+        if node.operation != 'query' and not node.is_leaf and not node.cryptographic])
+    assert manual.ok
+    assert summary(manual.plan) == summary(greedy.plan)
+
+
+# Sizes follow the rows received by nodes: a selective node receives all the rows of its child
+def test_size_of_selective_node(tmp_path):
+    path = os.path.join(str(tmp_path), '')
+    shutil.copytree(os.path.join(ROOT, 'Examples', 'Select1'), path, dirs_exist_ok=True)
+    with open(os.path.join(path, 'relations.csv')) as file:
+        relations = list(csv.DictReader(file))
+    for relation in relations:
+        relation['rows'] = 1000
+    with open(os.path.join(path, 'relations.csv'), 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(relations[0]))
+        writer.writeheader()
+        writer.writerows(relations)
+    with open(os.path.join(path, 'tree.csv')) as file:
+        nodes = list(csv.DictReader(file))
+    nodes[1]['selectivity'] = 0.01
+    with open(os.path.join(path, 'tree.csv'), 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(nodes[0]) + ['selectivity'], restval='')
+        writer.writeheader()
+        writer.writerows(nodes)
+    inputs = Inputs.read(path)
+    catalog = inputs.catalog
+    Planner(inputs.root, catalog, inputs.prices, inputs.authorizations, inputs.global_Ap)
+    selection = inputs.root.children[0]
+    leaf = selection.children[0]
+    width = catalog.size(leaf.vp) + catalog.size(leaf.ve) + catalog.size(leaf.vE)
+    assert selection.operation == 'selection' and selection.rows == 10
+    assert selection.size == leaf.rows * width == 1000 * width
@@ -0,0 +1,267 @@
+import copy
+
+
+# Flat representation of a plan tree: nodes are stored in a list and linked by their positions in it, so that
+# the tree is walked, copied and pickled without recursion. Traversal orders are computed once and cached
+# until the structure of the tree changes.
+class PlanTree:
+    def __init__(self):
+        self.nodes = list()
+        # Position of the parent of every node (-1 for roots) and positions of its children, in order
+        self.parents = list()
+        self.children = list()
+        self.__index = None
+        self.__clear()
+
+    def __clear(self):
+        self.__pre_order = None
+        self.__post_order = None
+        # Positions of every node in the cached orders and number of nodes in its subtree
+        self.__pre_position = None
+        self.__post_position = None
+        self.__size = None
+
+    # Orders are not pickled, they are computed again when needed
+    def __getstate__(self):
+        return {'nodes': self.nodes, 'parents': self.parents, 'children': self.children}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__index = None
+        self.__clear()
+
+    # Nodes are copied one at a time, the tree is not copied recursively
+    def __deepcopy__(self, memo):
+        tree = PlanTree()
+        memo[id(self)] = tree
+        tree.nodes = [copy.deepcopy(node, memo) for node in self.nodes]
+        tree.parents = list(self.parents)
+        tree.children = [list(children) for children in self.children]
+        return tree
+
+    # Adds a node to the tree, as a root
+    def add(self, node):
+        node.tree = self
+        node.index = len(self.nodes)
+        self.nodes.append(node)
+        self.parents.append(-1)
+        self.children.append(list())
+        if self.__index is not None:
+            self.__index.update(node.index)
+        self.__clear()
+
+    # Moves a node (with its subtree) as last child of parent, a None parent makes it a root.
+    # Nothing changes if parent is already the parent of the node, as with anytree nodes.
+    def attach(self, node, parent):
+        if parent is not None and parent.tree is not self:
+            if self.parents[node.index] >= 0:
+                raise ValueError('PlanTree: cannot move node %s to another tree' % node.name)
+            parent.tree.merge(self)
+            return parent.tree.attach(node, parent)
+        old = self.parents[node.index]
+        if parent is None:
+            if old >= 0:
+                self.children[old].remove(node.index)
+                self.parents[node.index] = -1
+                if self.__index is not None:
+                    self.__index.update(old)
+                self.__clear()
+            return
+        if old == parent.index:
+            return
+        # Only a node with children can be an ancestor of parent
+        ancestor = parent.index if self.children[node.index] else -1
+        if parent is node:
+            ancestor = node.index
+        while ancestor >= 0:
+            if ancestor == node.index:
+                raise ValueError('PlanTree: node %s cannot be a descendant of itself' % node.name)
+            ancestor = self.parents[ancestor]
+        if old >= 0:
+            self.children[old].remove(node.index)
+        self.parents[node.index] = parent.index
+        self.children[parent.index].append(node.index)
+        if self.__index is not None:
+            if old >= 0:
+                self.__index.update(old)
+            self.__index.update(parent.index)
+        self.__clear()
+
+    # Moves all nodes of another tree in this tree
+    def merge(self, other):
+        offset = len(self.nodes)
+        for node in other.nodes:
+            node.tree = self
+            node.index += offset
+        self.nodes.extend(other.nodes)
+        self.parents.extend(parent + offset if parent >= 0 else -1 for parent in other.parents)
+        self.children.extend([child + offset for child in children] for children in other.children)
+        other.nodes, other.parents, other.children = list(), list(), list()
+        other.__index = self.__index = None
+        other.__clear()
+        self.__clear()
+
+    def __orders(self):
+        if self.__pre_order is not None:
+            return
+        children = self.children
+        pre_order = list()
+        reverse_post_order = list()
+        for root in range(len(self.nodes)):
+            if self.parents[root] >= 0:
+                continue
+            stack = [root]
+            while stack:
+                position = stack.pop()
+                pre_order.append(position)
+                stack.extend(reversed(children[position]))
+            stack = [root]
+            while stack:
+                position = stack.pop()
+                reverse_post_order.append(position)
+                stack.extend(children[position])
+        size = [1] * len(self.nodes)
+        for position in reversed(pre_order):
+            parent = self.parents[position]
+            if parent >= 0:
+                size[parent] += size[position]
+        self.__pre_position = [0] * len(self.nodes)
+        for i, position in enumerate(pre_order):
+            self.__pre_position[position] = i
+        post_order = reverse_post_order[::-1]
+        self.__post_position = [0] * len(self.nodes)
+        for i, position in enumerate(post_order):
+            self.__post_position[position] = i
+        self.__size = size
+        self.__pre_order = [self.nodes[position] for position in pre_order]
+        self.__post_order = [self.nodes[position] for position in post_order]
+
+    # All nodes of the tree, in post-order
+    def post_order_all(self):
+        self.__orders()
+        return self.__post_order
+
+    # Nodes of the subtree rooted in node, in pre-order
+    def pre_order(self, node):
+        self.__orders()
+        start = self.__pre_position[node.index]
+        return self.__pre_order[start:start + self.__size[node.index]]
+
+    # Nodes of the subtree rooted in node, in post-order
+    def post_order(self, node):
+        self.__orders()
+        end = self.__post_position[node.index] + 1
+        return self.__post_order[end - self.__size[node.index]:end]
+
+    def size(self, node):
+        self.__orders()
+        return self.__size[node.index]
+
+    # Index of leaves and attributes of subtrees, kept up to date while the tree changes
+    def index(self):
+        if self.__index is None:
+            self.__index = SubtreeIndex(self)
+        return self.__index
+
+
+# Leaves (in pre-order) and attributes to be re-encrypted (Ae) in the subtree rooted in each node of a tree.
+# Leaves of all the nodes are kept in a single array, in pre-order, where those of the subtree of a node are
+# the (start, end) range of the node: ranges are computed again, once, when leaves are requested after the tree
+# changed. Attributes are updated when a node is inserted or moved, only for the subtrees containing it, stopping
+# at the first ancestor that does not change.
+class SubtreeIndex:
+    def __init__(self, tree: PlanTree):
+        self.tree = tree
+        self.__leaves = None
+        self.__ranges = None
+        self.__Ae = [0] * len(tree.nodes)
+        for node in tree.post_order_all():
+            self.__compute(node.index)
+
+    def __compute(self, position):
+        node = self.tree.nodes[position]
+        Ae = node.Ae
+        for child in self.tree.children[position]:
+            Ae |= self.__Ae[child]
+        changed = Ae != self.__Ae[position]
+        self.__Ae[position] = Ae
+        return changed
+
+    # Leaves are in the same order in pre-order and in post-order, where a node follows the leaves of its subtree
+    def __compute_ranges(self):
+        self.__leaves = list()
+        self.__ranges = [None] * len(self.tree.nodes)
+        for node in self.tree.post_order_all():
+            children = self.tree.children[node.index]
+            if children:
+                start = self.__ranges[children[0]][0]
+            else:
+                start = len(self.__leaves)
+                self.__leaves.append(node)
+            self.__ranges[node.index] = start, len(self.__leaves)
+
+    # Updates the subtree rooted in position (a new or changed node) and its ancestors
+    def update(self, position):
+        if position == len(self.__Ae):
+            self.__Ae.append(0)
+        self.__leaves = self.__ranges = None
+        while position >= 0 and self.__compute(position):
+            position = self.tree.parents[position]
+
+    def leaves(self, node):
+        if self.__ranges is None:
+            self.__compute_ranges()
+        start, end = self.__ranges[node.index]
+        return self.__leaves[start:end]
+
+    # Attributes to be re-encrypted by the descendants of node
+    def descendants_Ae(self, node):
+        Ae = 0
+        for child in self.tree.children[node.index]:
+            Ae |= self.__Ae[child]
+        return Ae
+
+
+# Nodes of the subtree rooted in node in pre-order, computed once until the tree changes.
+# The list does not reflect changes made to the tree while visiting it, see iter_pre_order.
+def pre_order(node, filter_=None):
+    nodes = node.tree.pre_order(node)
+    if filter_ is not None:
+        return [n for n in nodes if filter_(n)]
+    return nodes
+
+
+# Nodes of the subtree rooted in node in post-order, computed once until the tree changes
+def post_order(node, filter_=None):
+    nodes = node.tree.post_order(node)
+    if filter_ is not None:
+        return [n for n in nodes if filter_(n)]
+    return nodes
+
+
+# Visits the subtree rooted in node in pre-order while it is changed: children of a node are taken after
+# the node is visited, so nodes inserted below the visited node are visited too (as anytree PreOrderIter)
+def iter_pre_order(node, filter_=None):
+    stack = [iter((node,))]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            continue
+        if filter_ is None or filter_(child):
+            yield child
+        stack.append(iter(child.children))
+
+
+# Visits the subtree rooted in node in post-order while it is changed: children of a node are taken before
+# visiting them, so nodes inserted in the visited part of the tree are not visited (as anytree PostOrderIter)
+def iter_post_order(node, filter_=None):
+    stack = [(None, iter((node,)))]
+    while stack:
+        child = next(stack[-1][1], None)
+        if child is None:
+            parent = stack.pop()[0]
+            if parent is not None and (filter_ is None or filter_(parent)):
+                yield parent
+            continue
+        stack.append((child, iter(child.children)))
@@ -0,0 +1,195 @@
+import csv
+import logging
+import os
+import random
+import string
+from argparse import ArgumentParser
+
+import coloredlogs as coloredlogs
+
+# Header of the files of an input directory
+TREE_COLUMNS = ['ID', 'operation', 'Ap', 'Ae', 'As', 'print_label', 'group_attr', 'parent']
+RELATION_COLUMNS = [
+    'name', 'primary_key', 'provider', 'plain_attr', 'enc_attr', 'attr', 'enc_costs', 'dec_costs', 'size', 'node_id']
+
+
+# Names of attributes: letters first, then other single characters
+def attribute_names(count):
+    names = list(string.ascii_uppercase + string.ascii_lowercase)
+    names += [chr(0x100 + i) for i in range(max(0, count - len(names)))]
+    return names[:count]
+
+
+# Random workload: base relations joined by a tree of joins and cartesian products with fan_in children each,
+# with depth unary operations (selections and projections) above every relation and every join.
+# The user U is authorized for all attributes in plain, so that every workload has a plan. With templates,
+# other subjects take their authorization from that number of random authorizations.
+class Workload:
+    def __init__(self, depth=2, fan_in=2, attributes=12, relations=4, subjects=9, seed=None, templates=None):
+        if fan_in < 2:
+            raise ValueError('Workload: fan-in must be at least 2')
+        if relations < 1 or attributes < 2 * relations:
+            raise ValueError('Workload: every relation needs at least two attributes')
+        self.random = random.Random(seed)
+        self.depth = depth
+        self.fan_in = fan_in
+        self.attributes = attribute_names(attributes)
+        self.relations = list()
+        self.rows = list()
+        self.__children = dict()
+        providers = ['P%d' % (i + 1) for i in range(relations)]
+        self.subjects = ['U'] + providers + ['S%d' % (i + 1) for i in range(subjects)]
+        self.__relations(providers)
+        self.__tree()
+        self.__authorizations(templates)
+
+    def __relations(self, providers):
+        attributes = list(self.attributes)
+        self.random.shuffle(attributes)
+        for i, provider in enumerate(providers):
+            attr = attributes[i::len(providers)]
+            enc_attr = [a for a in attr if self.random.random() < 0.5]
+            plain_attr = [a for a in attr if a not in enc_attr]
+            self.relations.append({
+                'name': 'R%d' % (i + 1), 'primary_key': attr[0], 'provider': provider,
+                'plain_attr': ''.join(plain_attr), 'enc_attr': ''.join(enc_attr), 'attr': ''.join(attr),
+                'enc_costs': ';'.join(str(self.random.randint(1, 9)) for _ in attr),
+                'dec_costs': ';'.join(str(self.random.randint(1, 9)) for _ in attr),
+                'size': ';'.join(str(self.random.randint(1, 20)) for _ in attr)})
+
+    # Adds a node (as a row of tree.csv without position) and returns its id
+    def __node(self, operation, Ap='', Ae='', As='', group_attr='', label=None, children=()):
+        node = len(self.rows)
+        self.rows.append({
+            'operation': operation, 'Ap': Ap, 'Ae': Ae, 'As': As,
+            'print_label': label or '%s %d' % (operation.capitalize(), node + 1), 'group_attr': group_attr})
+        self.__children[node] = list(children)
+        return node
+
+    # Adds depth unary operations above node, over the attributes available in its result
+    def __unary(self, node, available):
+        for _ in range(self.depth):
+            if self.random.random() < 0.6 or len(available) <= 2:
+                attrs = ''.join(self.random.sample(available, min(len(available), self.random.randint(1, 2))))
+                kind = self.random.choice(['Ap', 'Ae', 'As'])
+                node = self.__node('selection', children=[node], **{kind: attrs})
+            else:
+                dropped = self.random.choice(available)
+                available = [a for a in available if a != dropped]
+                node = self.__node('projection', As=''.join(available), children=[node])
+        return node, available
+
+    def __tree(self):
+        inputs = list()
+        for relation in self.relations:
+            leaf = self.__node('projection', As=relation['attr'], label='Projection ' + relation['name'])
+            relation['node'] = leaf
+            inputs.append(self.__unary(leaf, list(relation['attr'])))
+        self.random.shuffle(inputs)
+        # Joins and cartesian products combine fan_in inputs at a time
+        while len(inputs) > 1:
+            group, inputs = inputs[:self.fan_in], inputs[self.fan_in:]
+            available = [a for _, attrs in group for a in attrs]
+            if self.random.random() < 0.8:
+                condition = ''.join(self.random.choice(attrs) for _, attrs in group)
+                kind = self.random.choice(['Ap', 'Ae', 'As'])
+                node = self.__node('join', children=[node for node, _ in group], **{kind: condition})
+            else:
+                node = self.__node('cartesian', children=[node for node, _ in group])
+            inputs.append(self.__unary(node, available))
+        root, available = inputs[0]
+        # Aggregation of the result
+        if len(available) >= 3 and self.random.random() < 0.5:
+            group_attr = self.random.choice(available)
+            rest = [a for a in available if a != group_attr]
+            root = self.__node(
+                'group-by', Ap=rest[0], Ae=group_attr, As=''.join(rest[1:]), group_attr=group_attr, children=[root])
+        self.root = root
+
+    def __authorizations(self, templates):
+        self.prices = {subject: (self.random.randint(1, 9), self.random.randint(1, 9)) for subject in self.subjects}
+        self.authorizations = {'U': (''.join(self.attributes), '')}
+        for relation in self.relations:
+            self.authorizations[relation['provider']] = ('', relation['attr'])
+        if templates is not None:
+            templates = [self.__authorization() for _ in range(templates)]
+        for subject in self.subjects:
+            if subject in self.authorizations:
+                continue
+            if templates:
+                self.authorizations[subject] = self.random.choice(templates)
+            else:
+                self.authorizations[subject] = self.__authorization()
+
+    # Random authorization (plain and encrypted attributes)
+    def __authorization(self):
+        attributes = list(self.attributes)
+        self.random.shuffle(attributes)
+        n1 = self.random.randint(0, len(attributes))
+        n2 = self.random.randint(n1, len(attributes))
+        return ''.join(attributes[:n1]), ''.join(attributes[n1:n2])
+
+    # Rows of tree.csv in pre-order, so that the root is the first row and parents precede children
+    def tree_rows(self):
+        rows = list()
+        position = dict()
+        stack = [(self.root, None)]
+        while stack:
+            node, parent = stack.pop()
+            position[node] = len(rows) + 1
+            rows.append(dict(self.rows[node], ID=position[node], parent=position[parent] if parent is not None else ''))
+            stack.extend((child, node) for child in reversed(self.__children[node]))
+        return rows, position
+
+    # Writes the workload as an input directory of the algorithm
+    def write(self, path):
+        os.makedirs(path, exist_ok=True)
+        rows, position = self.tree_rows()
+        with open(os.path.join(path, 'tree.csv'), 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=TREE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        with open(os.path.join(path, 'relations.csv'), 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=RELATION_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            for relation in self.relations:
+                writer.writerow(dict(relation, node_id=position[relation['node']]))
+        with open(os.path.join(path, 'subjects.csv'), 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['subject', 'comp_price', 'transfer_price'])
+            writer.writerows([subject, *self.prices[subject]] for subject in self.subjects)
+        with open(os.path.join(path, 'authorizations.csv'), 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['subject', 'plain', 'enc'])
+            writer.writerows([subject, *self.authorizations[subject]] for subject in self.subjects)
+        logging.info('Workload with %d nodes written in %s', len(rows), path)
+        return len(rows)
+
+
+def parse_args():
+    parser = ArgumentParser(description='Generate a random input of the algorithm')
+    parser.add_argument('path', metavar='PATH', help="Directory where to write the input files")
+    parser.add_argument(
+        '--depth', type=int, default=2, metavar='N', help="Unary operations above every relation and join")
+    parser.add_argument(
+        '--fan-in', type=int, default=2, metavar='N', dest='fan_in', help="Children of joins and cartesian products")
+    parser.add_argument('--attributes', type=int, default=12, metavar='N', help="Number of attributes")
+    parser.add_argument('--relations', type=int, default=4, metavar='N', help="Number of base relations")
+    parser.add_argument(
+        '--subjects', type=int, default=9, metavar='N', help="Number of subjects besides user and storage providers")
+    parser.add_argument('--seed', type=int, metavar='SEED', help="Seed of the random generator")
+    parser.add_argument(
+        '--templates', type=int, metavar='N', help="Number of distinct authorizations of subjects (default: random)")
+    parser.add_argument(
+        '-v', '--verbose', help="Be verbose", action="store_const",
+        dest="loglevel", const=logging.INFO, default=logging.WARNING)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    coloredlogs.install(
+        level=args.loglevel, fmt='%(asctime)s [%(funcName)s] %(levelname)s %(message)s', datefmt='%H:%M:%S')
+    Workload(
+        args.depth, args.fan_in, args.attributes, args.relations, args.subjects, args.seed, args.templates
+    ).write(args.path)